@@ -1,11 +1,11 @@
 from django.contrib import admin
 from django.contrib import messages
 from django.urls import reverse
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 
 from events.views import send_approval_notification
-from .models import Event, Venue, EventParticipation, Volunteer, VenueBooking, Rating, Task, ApprovalHistory
-from .utils import allocate_venue
+from .models import Event, Venue, EventParticipation, Volunteer, VenueBooking, VenueUtilization, Rating, Task, ApprovalHistory
+from .utils import allocate_venues
 
 admin.site.register(Task)
 
@@ -26,19 +26,22 @@ class EventAdmin(admin.ModelAdmin):
         return self.readonly_fields
 
     def approve_events(self, request, queryset):
-        updated = 0
-        for event in queryset:
-            if event.status != 'approved': 
-                event.status = 'approved'
-                event.save()
-                ApprovalHistory.objects.create(event=event, action_by=request.user, action='approve')
-                send_approval_notification(event)
-                if allocate_venue(event):
-                    messages.success(request, f"Venue allocated for {event.title}.")
-                else:
-                    messages.warning(request, f"No suitable venue available for {event.title}.")
-                updated += 1
-        messages.info(request, f"{updated} event(s) approved.")
+        events = list(queryset.exclude(status='approved'))
+        # Queryset update skips the per-event post_save allocation; venues are
+        # allocated for the whole selection at once below
+        Event.objects.filter(pk__in=[event.pk for event in events]).update(status='approved')
+        ApprovalHistory.objects.bulk_create([
+            ApprovalHistory(event=event, action_by=request.user, action='approve') for event in events
+        ])
+        allocated = allocate_venues(events)
+        for event in events:
+            event.status = 'approved'
+            send_approval_notification(event)
+            if allocated[event.id]:
+                messages.success(request, f"Venue allocated for {event.title}.")
+            else:
+                messages.warning(request, f"No suitable venue available for {event.title}.")
+        messages.info(request, f"{len(events)} event(s) approved.")
 
     def approval_link(self, obj):
         if obj.status == 'pending':
@@ -76,5 +79,39 @@ class VenueBookingAdmin(admin.ModelAdmin):
     list_filter = ('start_time',)
     search_fields = ('event__title', 'venue__name')
 
+@admin.register(VenueUtilization)
+class VenueUtilizationAdmin(admin.ModelAdmin):
+    list_display = ('venue', 'week_start', 'booked_hours', 'utilization_percent', 'peak_hour_display')
+    list_filter = ('week_start', 'venue')
+    search_fields = ('venue__name',)
+    list_select_related = ('venue',)
+    fields = ('venue', 'week_start', 'booked_hours', 'utilization_percent', 'peak_hour_display', 'heatmap')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False  # Maintained from bookings and compute_venue_utilization
+
+    def utilization_percent(self, obj):
+        return f"{obj.utilization:.0%}"
+    utilization_percent.short_description = 'Utilization'
+
+    def peak_hour_display(self, obj):
+        return f"{obj.peak_hour:02d}:00" if obj.peak_hour is not None else "-"
+    peak_hour_display.short_description = 'Peak hour'
+
+    def heatmap(self, obj):
+        if not obj.hourly_heatmap:
+            return "-"
+        peak = max(max(day) for day in obj.hourly_heatmap) or 1
+        header = format_html_join('', '<th>{}</th>', ((hour,) for hour in range(24)))
+        rows = format_html_join('', '<tr><th>{}</th>{}</tr>', (
+            (day_name, format_html_join('', '<td style="background: rgba(220, 38, 38, {})">{}</td>', (
+                (round(hours / peak, 2), f"{hours:g}" if hours else "") for hours in day
+            )))
+            for day_name, day in zip(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'], obj.hourly_heatmap)
+        ))
+        return format_html('<table><tr><th></th>{}</tr>{}</table>', header, rows)
+    heatmap.short_description = 'Booked hours by weekday and hour'
+
 admin.site.register(Rating)
 admin.site.register(ApprovalHistory)
\ No newline at end of file
@@ -6,5 +6,6 @@ class EventsConfig(AppConfig):
 
     def ready(self):
         import events.utils
+        import events.recommendations
         import events.models
         import events.signals
\ No newline at end of file
@@ -3,7 +3,8 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
 import pytz
-from .models import GroupChat, Message, GroupChatMember
+from .models import GroupChat, Message, GroupChatMember, Event, Task, Volunteer
+from .utils import is_event_participant, task_board_group_name, get_task_suggestions
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -68,4 +69,53 @@ class ChatConsumer(AsyncWebsocketConsumer):
             group_chat=group_chat,
             user=self.user,
             content=message_content
-        )
\ No newline at end of file
+        )
+
+class TaskBoardConsumer(AsyncWebsocketConsumer):
+    """Pushes task create/update/delete deltas for one event's todo board."""
+    async def connect(self):
+        self.event_id = self.scope['url_route']['kwargs']['event_id']
+        self.board_group_name = task_board_group_name(self.event_id)
+        self.user = self.scope['user']
+
+        if not await self.is_member():
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(
+            self.board_group_name,
+            self.channel_name
+        )
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(
+            self.board_group_name,
+            self.channel_name
+        )
+
+    async def task_delta(self, event):
+        message = {
+            'action': event['action'],
+            'task': event['task'],
+        }
+        if self.is_host:
+            # Any task change can move the suggestions for every unassigned task
+            message['suggestions'] = await self.task_suggestions()
+        await self.send(text_data=json.dumps(message))
+
+    @database_sync_to_async
+    def is_member(self):
+        if not self.user.is_authenticated:
+            return False
+        event = Event.objects.filter(id=self.event_id, status='approved').first()
+        self.is_host = event is not None and event.proposed_by_id == self.user.id
+        return event is not None and is_event_participant(self.user, event)
+
+    @database_sync_to_async
+    def task_suggestions(self):
+        """Suggested volunteer username per task description, as the todo page shows them."""
+        event = Event.objects.get(id=self.event_id)
+        volunteers = Volunteer.objects.filter(event=event, is_approved=True).select_related('user').order_by('id')
+        suggestions = get_task_suggestions(volunteers, Task.objects.filter(event=event), event)
+        return {description: volunteer.user.username for description, volunteer in suggestions.items()}
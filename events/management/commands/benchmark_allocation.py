@@ -0,0 +1,135 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ...models import Event, Venue
+from ...utils import COLLEGE_LATITUDE, COLLEGE_LONGITUDE, allocate_venue, allocate_venues
+
+def summarize(latencies, queries, successes):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'runs': len(latencies),
+        'success_rate': round(sum(successes) / len(successes), 4) if successes else None,
+        'queries_total': int(sum(queries)),
+        'queries_per_run': round(float(np.mean(queries)), 2) if queries else None,
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3) if latencies else None,
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3) if latencies else None,
+        'total_s': round(float(latencies_ms.sum()) / 1000, 4),
+    }
+
+def timed(func, *args):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+    return result, elapsed, len(queries)
+
+class Command(BaseCommand):
+    help = 'Benchmarks venue allocation on a synthetic world seeded into a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--venues', type=int, default=200, help='Number of synthetic venues')
+        parser.add_argument('--events', type=int, default=1000, help='Number of synthetic events')
+        parser.add_argument('--days', type=int, default=30, help='Days the events are spread over')
+        parser.add_argument('--single', type=int, default=200, help='Events allocated one at a time with allocate_venue')
+        parser.add_argument('--bulk', type=int, default=200, help='Events allocated together with allocate_venues')
+        parser.add_argument('--reallocate', type=int, default=100, help='Allocated events re-allocated after an attendee change')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        # Never touch real data: everything runs in a fresh test database
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload)
+            self.stdout.write(f"Benchmark report saved to {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+    def seed_world(self, rng, options):
+        Venue.objects.bulk_create([
+            Venue(
+                name=f"Synthetic venue {i}",
+                capacity=int(rng.choice([30, 50, 80, 120, 200, 350, 500, 1000])),
+                # Scattered up to roughly 10 km around the college
+                latitude=COLLEGE_LATITUDE + rng.uniform(-0.09, 0.09),
+                longitude=COLLEGE_LONGITUDE + rng.uniform(-0.09, 0.09),
+            )
+            for i in range(options['venues'])
+        ], batch_size=1000)
+
+        start = timezone.now() + timedelta(days=1)
+        events = []
+        for i in range(options['events']):
+            date = start + timedelta(minutes=30 * rng.randrange(options['days'] * 48))
+            events.append(Event(
+                title=f"Synthetic event {i}",
+                description="Benchmark event",
+                date=date,
+                end_date=date + timedelta(hours=rng.randint(1, 6)),
+                expected_attendees=min(int(rng.lognormvariate(4, 1)), 1000),
+                status='approved',
+            ))
+        # bulk_create skips post_save, so no deferred allocations are queued
+        Event.objects.bulk_create(events, batch_size=1000)
+
+    def run_benchmark(self, options):
+        rng = random.Random(options['seed'])
+        self.seed_world(rng, options)
+        events = list(Event.objects.order_by('id'))
+        rng.shuffle(events)
+        single_events = events[:options['single']]
+        bulk_events = events[options['single']:options['single'] + options['bulk']]
+
+        latencies, queries, successes = [], [], []
+        for event in single_events:
+            allocated, elapsed, count = timed(allocate_venue, event)
+            latencies.append(elapsed)
+            queries.append(count)
+            successes.append(allocated)
+        single = summarize(latencies, queries, successes)
+
+        bulk = {'events': len(bulk_events)}
+        if bulk_events:
+            results, elapsed, count = timed(allocate_venues, bulk_events)
+            bulk.update(
+                success_rate=round(sum(results.values()) / len(results), 4),
+                queries_total=count,
+                total_s=round(elapsed, 4),
+                per_event_ms=round(elapsed * 1000 / len(bulk_events), 3),
+            )
+
+        allocated_ids = [event.id for event, ok in zip(single_events, successes) if ok]
+        latencies, queries, successes = [], [], []
+        for event_id in allocated_ids[:options['reallocate']]:
+            event = Event.objects.select_related('venue').get(pk=event_id)
+            event.expected_attendees = max(1, int(event.expected_attendees * rng.uniform(0.5, 2.0)))
+            Event.objects.filter(pk=event_id).update(expected_attendees=event.expected_attendees)
+            allocated, elapsed, count = timed(allocate_venue, event)
+            latencies.append(elapsed)
+            queries.append(count)
+            successes.append(allocated)
+        reallocation = summarize(latencies, queries, successes)
+
+        return {
+            'config': {key: options[key] for key in ('venues', 'events', 'days', 'single', 'bulk', 'reallocate', 'seed')},
+            'database': connection.vendor,
+            'single_allocation': single,
+            'bulk_allocation': bulk,
+            'reallocation_after_attendee_change': reallocation,
+        }
@@ -1,75 +1,166 @@
+import time
 import numpy as np
+from functools import partial
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from django.utils import timezone
-from ...models import Event, Rating
-from scipy.spatial.distance import cosine
+from ...models import Event
+from ...recommendations import (user_rating_matrix, unit_rows, top_k_indices, recommendation_store,
+                                UserSimilarityIndex, USER_SIMILARITY_INDEX_PATH)
+from ...sharding import run_sharded, shared_arrays, csr_parts, csr_from_parts
 import json
 
+SIMILARITY_CHUNK_SIZE = 256
+SIMILAR_USERS = 5
+SIMILARITY_THRESHOLD = 0.1
+
+def exact_neighbours(unit_ratings, chunk):
+    """Matrix rows of the most similar users for a chunk of users, -1 where none pass the threshold."""
+    similarities = (unit_ratings[chunk] @ unit_ratings.T).toarray()
+    rows = np.arange(similarities.shape[0])
+    similarities[rows, rows + chunk.start] = 0
+    similarities[similarities < SIMILARITY_THRESHOLD] = 0
+    return top_k_indices(similarities, SIMILAR_USERS)
+
+def approximate_neighbours(index, user_ids, unit_ratings, chunk):
+    """Same as exact_neighbours, with candidates taken from the LSH index."""
+    neighbour_ids, similarities = index.query(unit_ratings[chunk], SIMILAR_USERS, exclude_users=user_ids[chunk])
+    neighbour_ids[similarities < SIMILARITY_THRESHOLD] = -1
+    # user_ids is sorted, so a user's matrix row is its searchsorted position
+    return np.where(neighbour_ids >= 0, np.searchsorted(user_ids, neighbour_ids), -1)
+
+def recommend_rows(rating_matrix, unit_ratings, user_ids, start, end, index=None):
+    """Sorted event columns to recommend to each user in rows start..end."""
+    indptr, indices, scores = rating_matrix.indptr, rating_matrix.indices, rating_matrix.data
+    results = []
+    # users x users similarity never exists whole, only SIMILARITY_CHUNK_SIZE rows of it at a time
+    for chunk_start in range(start, end, SIMILARITY_CHUNK_SIZE):
+        chunk = slice(chunk_start, min(chunk_start + SIMILARITY_CHUNK_SIZE, end))
+        if index is None:
+            neighbours = exact_neighbours(unit_ratings, chunk)
+        else:
+            neighbours = approximate_neighbours(index, user_ids, unit_ratings, chunk)
+
+        for user_idx in range(chunk.start, chunk.stop):
+            rated = set(indices[indptr[user_idx]:indptr[user_idx + 1]].tolist())
+
+            # Recommend events rated highly by similar users
+            recommended_idx = set()
+            for other_idx in neighbours[user_idx - chunk.start]:
+                if other_idx < 0:
+                    break
+                row = slice(indptr[other_idx], indptr[other_idx + 1])
+                for e_idx in indices[row][scores[row] >= 4].tolist():
+                    if e_idx not in rated:  # Unrated, high score
+                        recommended_idx.add(e_idx)
+                        if len(recommended_idx) >= 3:
+                            break
+                if len(recommended_idx) >= 3:
+                    break
+            results.append(sorted(recommended_idx))
+    return results
+
+_worker_indexes = {}
+
+def _recommend_shard(index_path, start, end):
+    arrays = shared_arrays()
+    index = None
+    if index_path:
+        # loaded once per worker process from the file the parent just saved
+        index = _worker_indexes.get(index_path)
+        if index is None:
+            index = _worker_indexes[index_path] = UserSimilarityIndex.load(index_path)
+    return recommend_rows(
+        csr_from_parts(arrays, 'ratings'), csr_from_parts(arrays, 'unit_ratings'), arrays['user_ids'], start, end, index,
+    )
+
 class Command(BaseCommand):
     help = 'Computes collaborative event recommendations using cosine similarity'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--ann', action='store_true', help='Find similar users through the LSH index instead of exact all-pairs similarity, and save the index')
+        parser.add_argument('--index-path', default=USER_SIMILARITY_INDEX_PATH, help='Where the LSH index is saved')
+        parser.add_argument('--benchmark-recall', action='store_true', help='Only report LSH neighbour recall against exact similarity, nothing is written')
+        parser.add_argument('--sample', type=int, default=1000, help='Users sampled by --benchmark-recall')
+        parser.add_argument('--workers', type=int, default=1, help='Compute recommendations in this many processes')
+
     def handle(self, *args, **options):
-        events = Event.objects.filter(is_approved=True, date__gte=timezone.now())
+        events = Event.objects.filter(status='approved', date__gte=timezone.now())
         if not events.exists():
             self.stdout.write("No approved upcoming events found.")
             return
 
         events_list = list(events)
-        users = User.objects.filter(is_active=True)
-        if not users.exists():
+        users = list(User.objects.filter(is_active=True).order_by('id').values_list('id', 'username'))
+        if not users:
             self.stdout.write("No active users found.")
             return
 
         # Create user-event rating matrix
-        user_ids = list(users.values_list('id', flat=True))
-        event_ids = list(events.values_list('id', flat=True))
-        user_idx = {uid: i for i, uid in enumerate(user_ids)}
-        event_idx = {eid: i for i, eid in enumerate(event_ids)}
+        user_ids = np.array([user_id for user_id, _ in users], dtype=np.int64)
+        event_ids = [event.id for event in events_list]
+        rating_matrix = user_rating_matrix(user_ids.tolist(), event_ids)
+        unit_ratings = unit_rows(rating_matrix)
 
-        rating_matrix = np.zeros((len(user_ids), len(event_ids)))
-        ratings = Rating.objects.filter(event__in=events)
-        for rating in ratings:
-            if rating.user.id in user_idx and rating.event.id in event_idx:
-                rating_matrix[user_idx[rating.user.id], event_idx[rating.event.id]] = rating.score
+        if options['benchmark_recall']:
+            self.benchmark_recall(user_ids, event_ids, rating_matrix, unit_ratings, options['sample'])
+            return
+
+        index = None
+        if options['ann']:
+            index = UserSimilarityIndex.build(user_ids, event_ids, rating_matrix)
+            index.save(options['index_path'])
+
+        highlights = list(events.filter(is_highlight=True).order_by('date')[:3])
+        if options['workers'] > 1:
+            arrays = {'user_ids': user_ids, **csr_parts('ratings', rating_matrix), **csr_parts('unit_ratings', unit_ratings)}
+            worker = partial(_recommend_shard, options['index_path'] if index is not None else None)
+            shards = run_sharded(worker, len(users), options['workers'], arrays)
+            recommended_cols = [cols for shard in shards for cols in shard]
+        else:
+            recommended_cols = recommend_rows(rating_matrix, unit_ratings, user_ids, 0, len(users), index)
 
         recommendations = {}
-        for user in users:
-            user_vector = rating_matrix[user_idx[user.id]]
-            if np.sum(user_vector) == 0:
-                # Fallback to highlighted events
-                recs = events.filter(is_highlight=True).order_by('date')[:3]
-            else:
-                # Compute similarities with other users
-                similarities = []
-                for i in range(len(user_ids)):
-                    if i != user_idx[user.id]:
-                        sim = 1 - cosine(user_vector, rating_matrix[i])
-                        similarities.append((i, sim))
-                similarities.sort(key=lambda x: x[1], reverse=True)
-
-                # Recommend events rated highly by similar users
-                recommended_event_ids = set()
-                for other_user_idx, sim in similarities[:5]:  # Top 5 similar users
-                    if sim < 0.1:  # Similarity threshold
-                        break
-                    for e_idx, score in enumerate(rating_matrix[other_user_idx]):
-                        if score >= 4 and user_vector[e_idx] == 0:  # Unrated, high score
-                            recommended_event_ids.add(event_ids[e_idx])
-                            if len(recommended_event_ids) >= 3:
-                                break
-                    if len(recommended_event_ids) >= 3:
-                        break
-
-                recommended_events = [e for e in events_list if e.id in recommended_event_ids][:3]
-                if not recommended_events:
-                    recs = events.filter(is_highlight=True).order_by('date')[:3]
-                else:
-                    recs = recommended_events
-
-            recommendations[user.id] = [event.id for event in recs]
-            self.stdout.write(f"Recommended for {user.username}: {', '.join([e.title for e in recs])}")
-
-        with open('collaborative_recommendations.json', 'w') as f:
-            json.dump(recommendations, f)
-        self.stdout.write("Collaborative recommendations saved to collaborative_recommendations.json")
\ No newline at end of file
+        for (user_id, username), cols in zip(users, recommended_cols):
+            recommended = [events_list[i] for i in cols]
+            recommendations[user_id] = [event.id for event in recommended]
+            recs = recommended or highlights
+            self.stdout.write(f"Recommended for {username}: {', '.join([e.title for e in recs])}")
+
+        # highlights are the home page's own fallback, only real matches are published
+        recommendation_store.publish('collaborative', recommendations)
+        self.stdout.write("Collaborative recommendations published to the recommendation store")
+
+    def benchmark_recall(self, user_ids, event_ids, rating_matrix, unit_ratings, sample):
+        started = time.perf_counter()
+        index = UserSimilarityIndex.build(user_ids, event_ids, rating_matrix)
+        build_time = time.perf_counter() - started
+
+        rated = np.flatnonzero(np.diff(rating_matrix.indptr) > 0)
+        rows = np.random.default_rng(0).choice(rated, min(sample, len(rated)), replace=False)
+        rows.sort()
+
+        started = time.perf_counter()
+        exact = [exact_neighbours(unit_ratings, slice(row, row + 1))[0] for row in rows]
+        exact_time = time.perf_counter() - started
+        started = time.perf_counter()
+        approximate = [approximate_neighbours(index, user_ids, unit_ratings, slice(row, row + 1))[0] for row in rows]
+        approximate_time = time.perf_counter() - started
+
+        found = expected = 0
+        for exact_row, approximate_row in zip(exact, approximate):
+            exact_row = set(exact_row[exact_row >= 0].tolist())
+            found += len(exact_row & set(approximate_row.tolist()))
+            expected += len(exact_row)
+
+        self.stdout.write(json.dumps({
+            'users': len(user_ids),
+            'indexed_users': len(index.user_ids),
+            'sampled_users': len(rows),
+            'tables': index.planes.shape[0] // index.n_bits,
+            'bits': index.n_bits,
+            'build_seconds': round(build_time, 4),
+            'exact_ms_per_user': round(1000 * exact_time / max(len(rows), 1), 4),
+            'approximate_ms_per_user': round(1000 * approximate_time / max(len(rows), 1), 4),
+            f'recall_at_{SIMILAR_USERS}': round(found / expected, 4) if expected else None,
+        }, indent=2))
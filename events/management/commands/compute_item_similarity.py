@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from ...recommendations import feedback_matrix, event_schedule, ItemSimilarityModel, ITEM_NEIGHBOURS, ITEM_SIMILARITY_PATH
+
+class Command(BaseCommand):
+    help = 'Precomputes every event\'s most similar events from co-views, co-participation and ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=ITEM_NEIGHBOURS, help='Similar events kept per event')
+        parser.add_argument('--path', default=ITEM_SIMILARITY_PATH, help='Where the neighbour table is saved')
+
+    def handle(self, *args, **options):
+        feedback, user_ids, event_ids = feedback_matrix()
+        if not len(event_ids):
+            self.stdout.write("No event interactions found.")
+            return
+
+        event_dates, servable = event_schedule(event_ids)
+        model = ItemSimilarityModel.build(feedback, event_ids, event_dates, servable, k=options['neighbours'])
+        model.save(options['path'])
+        self.stdout.write(
+            f"Saved {options['neighbours']} neighbours for {len(event_ids)} events "
+            f"from {len(user_ids)} users to {options['path']}"
+        )
@@ -1,20 +1,39 @@
-from django.core.cache import cache
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from django.utils import timezone
-from ...models import Event, EventView, EventParticipation
-from scipy.spatial.distance import cosine
+from ...models import Event
+from ...recommendations import user_interaction_matrix, top_k_indices, recommendation_store
+from ...sharding import run_sharded, shared_arrays, csr_parts, csr_from_parts
+from scipy.sparse import coo_matrix
 import numpy as np
-import json
 
-def compute_recommendations():
+RECOMMENDATION_CHUNK_SIZE = 1024
+
+def score_users(user_matrix, event_matrix, excluded, start, end):
+    """Indices into event_matrix of the top three events for users start..end, -1 where there are fewer."""
+    tops = []
+    for chunk_start in range(start, end, RECOMMENDATION_CHUNK_SIZE):
+        chunk = slice(chunk_start, min(chunk_start + RECOMMENDATION_CHUNK_SIZE, end))
+        similarities = user_matrix[chunk] @ event_matrix.T
+        # only events of a type the user interacted with score above 0, which is what the old
+        # type match / similarity > 0.5 rule allowed through
+        rows, cols = excluded[chunk].nonzero()
+        similarities[rows, cols] = 0
+        tops.append(top_k_indices(similarities, 3))
+    return np.vstack(tops) if tops else np.empty((0, 3), dtype=np.intp)
+
+def _score_shard(start, end):
+    arrays = shared_arrays()
+    return score_users(arrays['user_matrix'], arrays['event_matrix'], csr_from_parts(arrays, 'excluded'), start, end)
+
+def compute_recommendations(workers=1):
     events = Event.objects.filter(status='approved', date__gte=timezone.now())
     if not events.exists():
         print("No approved upcoming events found.")
         return
 
     events_list = list(events) # usefully while making vectors
-    event_types = set(events.values_list('event_type', flat=True))
+    event_types = set(event.event_type for event in events_list)
     type_to_idx = {event_type: idx for idx, event_type in enumerate(event_types)} # to create dict
 
     event_matrix = np.zeros((len(events_list), len(type_to_idx)))  # row = event, col = event type
@@ -22,66 +41,59 @@ def compute_recommendations():
     for idx, event in enumerate(events_list):
         event_matrix[idx, type_to_idx[event.event_type]] = 1
 
-    users = User.objects.filter(is_active=True)
-    user_matrix = np.zeros((users.count(), len(type_to_idx)))   # create empty matrix
-
+    users = list(User.objects.filter(is_active=True).order_by('id').values_list('id', 'username'))
+    interactions, interacted_ids, interacted_types = user_interaction_matrix([user_id for user_id, _ in users])
+
+    # interacted event types nothing upcoming has carry no signal for scoring
+    typed_cols = [col for col, event_type in enumerate(interacted_types) if event_type in type_to_idx]
+    type_ohe = coo_matrix(
+        (np.ones(len(typed_cols)), (typed_cols, [type_to_idx[interacted_types[col]] for col in typed_cols])),
+        shape=(len(interacted_types), len(type_to_idx)),
+    ).tocsr()
+    # row = user, col = event type, value = events of that type the user interacted with
+    user_matrix = (interactions @ type_ohe).toarray()
+
+    # an event the user already interacted with is never recommended back to them
+    upcoming_idx = {event.id: idx for idx, event in enumerate(events_list)}
+    interacted_cols = [col for col, event_id in enumerate(interacted_ids.tolist()) if event_id in upcoming_idx]
+    to_upcoming = coo_matrix(
+        (np.ones(len(interacted_cols)), (interacted_cols, [upcoming_idx[interacted_ids[col]] for col in interacted_cols])),
+        shape=(len(interacted_ids), len(events_list)),
+    ).tocsr()
+    excluded = (interactions @ to_upcoming).tocsr()
+
+    # cosine similarity is the product of unit vectors, event rows are one-hot so already unit length
+    norms = np.linalg.norm(user_matrix, axis=1, keepdims=True)
+    user_matrix = np.divide(user_matrix, norms, out=np.zeros_like(user_matrix), where=norms > 0)
+
+    highlights = list(events.filter(is_highlight=True).order_by('date')[:3])
     recommendations = {}
 
-    # user_matrix, user
-    for user_idx, user in enumerate(users):
-        proposed_events = Event.objects.filter(proposed_by=user, status='approved').distinct()
-        viewed_events = Event.objects.filter(views__user=user).distinct()
-        participated_events = Event.objects.filter(participations__user=user, participations__status='approved').distinct()
-        all_events = (proposed_events | viewed_events | participated_events).distinct()
-
-        # count the times the user interacted with the event    
-        type_counts = {}
-        for event in all_events:
-            type_counts[event.event_type] = type_counts.get(event.event_type, 0) + 1
-
-        # store user profile as interest count 
-        for event_type, count in type_counts.items():
-            if event_type in type_to_idx:
-                user_matrix[user_idx, type_to_idx[event_type]] = count
-
-        user_vector = user_matrix[user_idx]
-
-        # incase user not interacted show the upcoming
-        if np.sum(user_vector) == 0:
-            recs = events.filter(is_highlight=True).order_by('date')[:3]
-        else:
-            # using scipy cosine(a,b) gives cosine distance and subtracting 1 - cosine(a,b) gives similarity
-            # where cosine distance = 1 - similarity
-            # user_vector has preference vector & event_vec is ohe vector of event
-            similarities = [1 - cosine(user_vector, event_vec) for event_vec in event_matrix]
-            # sort based on similarlity, highest first
-            top_indices = np.argsort(similarities)[::-1]
-            excluded_ids = set(all_events.values_list('id', flat=True))
-
-            # recommending 3 events if similarity > 0.5
-            recommended_events = []
-            for i in top_indices:
-                if events_list[i].id not in excluded_ids:
-                    event_type_match = events_list[i].event_type in type_counts
-                    if event_type_match or (len(type_counts) > 1 and similarities[i] > 0.5):
-                        recommended_events.append(events_list[i])
-                        if len(recommended_events) >= 3:
-                            break
-            recs = recommended_events[:3] or events.filter(is_highlight=True).order_by('date')[:3]
-
-        recommendations[user.id] = [event.id for event in recs]
-        print(f"Recommended for {user.username}: {', '.join([e.title for e in recs])}")
-
-    cache.set('event_recommendations', recommendations, timeout=86400)
-    with open('recommendations.json', 'w') as f:
-        json.dump(recommendations, f)
-    print("Recommendations saved to recommendations.json and cached")
+    if workers > 1:
+        arrays = {'user_matrix': user_matrix, 'event_matrix': event_matrix, **csr_parts('excluded', excluded)}
+        shards = run_sharded(_score_shard, len(users), workers, arrays)
+        top = np.vstack(shards) if shards else np.empty((0, 3), dtype=np.intp)
+    else:
+        top = score_users(user_matrix, event_matrix, excluded, 0, len(users))
+
+    for (user_id, username), row in zip(users, top):
+        recommended = [events_list[i] for i in row if i >= 0]
+        recommendations[user_id] = [event.id for event in recommended]
+        recs = recommended or highlights
+        print(f"Recommended for {username}: {', '.join([e.title for e in recs])}")
+
+    # highlights are the home page's own fallback, only real matches are published
+    recommendation_store.publish('content', recommendations)
+    print("Recommendations published to the recommendation store")
 
 class Command(BaseCommand):
     help = 'Triggers the asynchronous computation of event recommendations'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Score users in this many processes')
+
     def handle(self, *args, **options):
-        compute_recommendations()
+        compute_recommendations(workers=options['workers'])
         self.stdout.write("Recommendation computation triggered asynchronously.")
 
         
\ No newline at end of file
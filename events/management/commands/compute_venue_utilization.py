@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ...models import VenueBooking, VenueUtilization
+from ...utils import booking_utilization
+
+class Command(BaseCommand):
+    help = 'Rebuilds weekly venue utilization aggregates from all venue bookings in one streaming pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Bookings fetched per database round trip')
+
+    def handle(self, *args, **options):
+        totals = {}
+        bookings = VenueBooking.objects.values_list('venue_id', 'start_time', 'end_time').iterator(chunk_size=options['chunk_size'])
+        count = 0
+        for venue_id, start_time, end_time in bookings:
+            for week_start, heatmap in booking_utilization(start_time, end_time).items():
+                key = (venue_id, week_start)
+                if key in totals:
+                    totals[key] += heatmap
+                else:
+                    totals[key] = heatmap
+            count += 1
+
+        with transaction.atomic():
+            VenueUtilization.objects.all().delete()
+            VenueUtilization.objects.bulk_create([
+                VenueUtilization(
+                    venue_id=venue_id,
+                    week_start=week_start,
+                    booked_hours=round(float(heatmap.sum()), 4),
+                    hourly_heatmap=heatmap.round(4).tolist(),
+                )
+                for (venue_id, week_start), heatmap in totals.items()
+            ], batch_size=1000)
+
+        self.stdout.write(f"Aggregated {count} bookings into {len(totals)} venue-week rows.")
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from ...recommendations import feedback_matrix, event_schedule, recommendation_store, ImplicitALSModel, ALS_MODEL_PATH
+
+class Command(BaseCommand):
+    help = 'Trains the implicit-feedback matrix factorisation recommender with alternating least squares'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=32, help='Latent factors per user and event')
+        parser.add_argument('--iterations', type=int, default=10, help='Alternating user/event solves')
+        parser.add_argument('--regularization', type=float, default=0.1)
+        parser.add_argument('--alpha', type=float, default=10.0, help='Confidence gained per unit of feedback weight')
+        parser.add_argument('--path', default=ALS_MODEL_PATH, help='Where the factor matrices are saved')
+
+    def handle(self, *args, **options):
+        feedback, user_ids, event_ids = feedback_matrix()
+        if not len(event_ids):
+            self.stdout.write("No event interactions found.")
+            return
+
+        event_dates, servable = event_schedule(event_ids)
+
+        started = time.perf_counter()
+        model = ImplicitALSModel.train(
+            feedback, user_ids, event_ids, event_dates, servable,
+            factors=options['factors'],
+            iterations=options['iterations'],
+            regularization=options['regularization'],
+            alpha=options['alpha'],
+            log=lambda iteration: self.stdout.write(f"Iteration {iteration} done after {time.perf_counter() - started:.2f}s"),
+        )
+        model.save(options['path'])
+        self.stdout.write(
+            f"Saved {options['factors']} factors for {len(user_ids)} users and {len(event_ids)} events to {options['path']}"
+        )
+
+        # Served from the store like the other recommenders, only real matches are published
+        recommendations = {}
+        for user_id in user_ids.tolist():
+            ranked = model.recommend(user_id)
+            if ranked:
+                recommendations[user_id] = ranked
+        recommendation_store.publish('als', recommendations)
+        self.stdout.write(f"ALS recommendations for {len(recommendations)} users published to the recommendation store")
@@ -0,0 +1,83 @@
+from django.db import IntegrityError, migrations
+
+# PostgreSQL only: a generated tstzrange column plus a GiST exclusion constraint
+# so two bookings of the same venue can never overlap. Other databases rely on
+# the check in events.utils.book_venue instead.
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE events_venuebooking ADD COLUMN during tstzrange "
+    "GENERATED ALWAYS AS (tstzrange(start_time, end_time, '[)')) STORED",
+    "ALTER TABLE events_venuebooking ADD CONSTRAINT venuebooking_no_overlap "
+    "EXCLUDE USING gist (venue_id WITH =, during WITH &&)",
+]
+
+BACKWARD_SQL = [
+    "ALTER TABLE events_venuebooking DROP CONSTRAINT IF EXISTS venuebooking_no_overlap",
+    "ALTER TABLE events_venuebooking DROP COLUMN IF EXISTS during",
+]
+
+
+# Rows that would make the range column or the constraint fail. Empty ranges
+# (start == end) never overlap anything, as with && itself.
+CONFLICTS_SQL = """
+    SELECT a.id, b.id, a.venue_id, a.start_time, a.end_time, b.start_time, b.end_time
+    FROM events_venuebooking a
+    JOIN events_venuebooking b
+      ON a.venue_id = b.venue_id AND a.id < b.id
+     AND a.start_time < b.end_time AND b.start_time < a.end_time
+     AND a.start_time < a.end_time AND b.start_time < b.end_time
+    ORDER BY a.venue_id, a.start_time
+    LIMIT 50
+"""
+INVERTED_SQL = """
+    SELECT id, venue_id, start_time, end_time FROM events_venuebooking
+    WHERE end_time < start_time ORDER BY id LIMIT 50
+"""
+
+
+def check_existing_bookings(schema_editor):
+    """
+    Refuse to add the constraint over bookings that already break it. Those could be saved
+    by the old racy check or by hand in the admin, and which one to keep is a human call.
+    """
+    problems = []
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(INVERTED_SQL)
+        for booking_id, venue_id, start_time, end_time in cursor.fetchall():
+            problems.append(f"booking {booking_id} at venue {venue_id} ends before it starts ({start_time} > {end_time})")
+        cursor.execute(CONFLICTS_SQL)
+        for first, second, venue_id, first_start, first_end, second_start, second_end in cursor.fetchall():
+            problems.append(
+                f"bookings {first} ({first_start} - {first_end}) and {second} ({second_start} - {second_end}) "
+                f"overlap at venue {venue_id}"
+            )
+    if problems:
+        raise IntegrityError(
+            "Cannot add venuebooking_no_overlap, resolve these bookings first and rerun migrate "
+            "(at most 50 of each kind shown):\n  " + "\n  ".join(problems)
+        )
+
+
+def run_on_postgresql(statements, check=None):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        if check:
+            check(schema_editor)
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0024_alter_event_event_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(FORWARD_SQL, check=check_existing_bookings),
+            run_on_postgresql(BACKWARD_SQL),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0025_venuebooking_overlap_exclusion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueUtilization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(db_index=True, help_text='Monday of the week (local time)')),
+                ('booked_hours', models.FloatField(default=0)),
+                ('hourly_heatmap', models.JSONField(default=list)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utilization', to='events.venue')),
+            ],
+            options={
+                'ordering': ['-week_start', 'venue'],
+                'unique_together': {('venue', 'week_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0026_venueutilization'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['latitude', 'longitude'], name='events_venu_latitud_0c71cc_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, migrations
+from django.db.models import F
+
+# Bookings of events without an end_date used to be stored as zero-length ranges, which the
+# overlap constraint never matches. Give them the window the allocator plans with.
+# Kept in step with events.models.DEFAULT_EVENT_DURATION.
+DEFAULT_EVENT_DURATION = getattr(settings, 'DEFAULT_EVENT_DURATION', 4)  # Hours
+
+
+def extend_open_ended_bookings(apps, schema_editor):
+    VenueBooking = apps.get_model('events', 'VenueBooking')
+    duration = timedelta(hours=DEFAULT_EVENT_DURATION)
+    open_ended = VenueBooking.objects.filter(event__end_date__isnull=True, end_time=F('start_time'))
+
+    # As in 0025, which booking keeps the venue is a human call
+    problems = []
+    for booking_id, venue_id, start_time in open_ended.values_list('id', 'venue_id', 'start_time'):
+        clashes = VenueBooking.objects.filter(
+            venue_id=venue_id,
+            start_time__lt=start_time + duration,
+            end_time__gt=start_time,
+        ).exclude(id=booking_id).values_list('id', flat=True)
+        for other_id in clashes:
+            problems.append(f"booking {booking_id} at venue {venue_id} would overlap booking {other_id} once it lasts {duration}")
+    if problems:
+        raise IntegrityError(
+            "Cannot extend open-ended bookings, resolve these bookings first and rerun migrate "
+            "(at most 50 shown):\n  " + "\n  ".join(problems[:50])
+        )
+
+    open_ended.update(end_time=F('start_time') + duration)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0027_venue_coordinates_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(extend_open_ended_bookings, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,12 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib import messages
 from django.core.validators import RegexValidator
+from django.conf import settings
+from datetime import timedelta
+
+# Opening hours a venue offers per week, the denominator of utilization
+VENUE_AVAILABLE_HOURS_PER_WEEK = getattr(settings, 'VENUE_AVAILABLE_HOURS_PER_WEEK', 7 * 12)
+DEFAULT_EVENT_DURATION = getattr(settings, 'DEFAULT_EVENT_DURATION', 4)  # Hours
 
 class Venue(models.Model):
     name = models.CharField(max_length=200)
@@ -19,7 +25,10 @@ class Venue(models.Model):
         return self.name
 
     class Meta:
-        indexes = [models.Index(fields=['capacity'])]
+        indexes = [
+            models.Index(fields=['capacity']),
+            models.Index(fields=['latitude', 'longitude']),  # Bounding-box prefilter for nearby searches
+        ]
 
     def parse_coordinates(self):
         import re
@@ -79,10 +88,48 @@ class Event(models.Model):
     status = models.CharField(max_length=20, choices=EVENT_STATUS, default='pending')
     rejection_reason = models.TextField(blank=True, null=True)
 
+    # Snapshotted on load so post_save can see what changed without re-fetching the row
+    TRACKED_FIELDS = ('expected_attendees', 'date', 'end_date', 'status', 'venue_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def _snapshot_tracked_fields(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {name: getattr(self, name) for name in self.TRACKED_FIELDS if name not in deferred}
+
+    def changed_fields(self):
+        """
+        Tracked fields whose value differs from when the event was loaded or last
+        saved, mapped to their previous value. Unsaved events report every field.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return {name: None for name in self.TRACKED_FIELDS}
+        return {
+            name: previous for name, previous in loaded.items()
+            if getattr(self, name) != previous
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_tracked_fields()
+
     def clean(self):
         if self.end_date and self.end_date < self.date:
             raise ValidationError("End date cannot be before start date.")
 
+    def booking_window(self):
+        """The time a venue is held for this event; open-ended events get DEFAULT_EVENT_DURATION."""
+        return self.date, self.end_date or self.date + timedelta(hours=DEFAULT_EVENT_DURATION)
+
     def is_upcoming(self):
         return self.date >= timezone.now()
     
@@ -105,10 +152,21 @@ class VenueBooking(models.Model):
         if self.event.venue and self.venue != self.event.venue:
             raise ValidationError("Booking  venue must match event venue if set")
         
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_slot()
+        return instance
+
+    def _snapshot_slot(self):
+        # Slot as last stored, so post_save can take back the old utilization
+        self._loaded_slot = (self.venue_id, self.start_time, self.end_time)
+
     def save(self, *args, **kwargs):
-        self.start_time = self.event.date
-        self.end_time = self.event.end_date or self.event.date
+        # The window the allocator planned with, so the overlap constraint sees the same one
+        self.start_time, self.end_time = self.event.booking_window()
         super().save(*args,**kwargs)
+        self._snapshot_slot()
 
     def __str__(self):
         return f"{self.event.title} at {self.venue.name}"
@@ -116,6 +174,31 @@ class VenueBooking(models.Model):
     class Meta:
         unique_together = ('venue', 'start_time', 'end_time')
         indexes = [models.Index(fields=['venue', 'start_time', 'end_time'])]
+
+class VenueUtilization(models.Model):
+    venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='utilization')
+    week_start = models.DateField(db_index=True, help_text="Monday of the week (local time)")
+    booked_hours = models.FloatField(default=0)
+    # 7 x 24 booked hours, indexed [weekday][hour]
+    hourly_heatmap = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('venue', 'week_start')
+        ordering = ['-week_start', 'venue']
+
+    @property
+    def utilization(self):
+        return self.booked_hours / VENUE_AVAILABLE_HOURS_PER_WEEK
+
+    @property
+    def peak_hour(self):
+        hourly_totals = [sum(day[hour] for day in self.hourly_heatmap) for hour in range(24)] if self.hourly_heatmap else []
+        if not hourly_totals or not max(hourly_totals):
+            return None
+        return hourly_totals.index(max(hourly_totals))
+
+    def __str__(self):
+        return f"{self.venue.name} week of {self.week_start}: {self.utilization:.0%}"
     
 class ApprovalHistory(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='approval_history')
@@ -0,0 +1,708 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.db.models import F, FloatField, Value
+from django.conf import settings
+from django.core.cache import cache
+from collections import OrderedDict, defaultdict
+from math import sqrt
+from time import monotonic, time
+import os
+import threading
+
+from .models import Event, EventView, EventParticipation, Volunteer, Rating
+from .utils import CoalescingQueue, bump_cache_version
+from scipy.sparse import coo_matrix, csr_matrix, diags
+import numpy as np
+
+INTERACTION_CHUNK_SIZE = 5000
+# Random-hyperplane LSH for user similarity: more tables raise recall, more bits shrink buckets
+USER_LSH_TABLES = getattr(settings, 'USER_LSH_TABLES', 16)
+USER_LSH_BITS = getattr(settings, 'USER_LSH_BITS', 8)
+USER_SIMILARITY_INDEX_PATH = getattr(settings, 'USER_SIMILARITY_INDEX_PATH', 'user_similarity_index.npz')
+ITEM_SIMILARITY_PATH = getattr(settings, 'ITEM_SIMILARITY_PATH', 'item_similarity.npy')
+ITEM_NEIGHBOURS = getattr(settings, 'ITEM_NEIGHBOURS', 20)
+ITEM_RECENT_INTERACTIONS = 20
+# Implicit feedback strength per interaction; ratings count per star
+FEEDBACK_WEIGHTS = {'view': 1.0, 'going': 2.0, 'volunteer': 3.0, 'rating': 0.5}
+ALS_MODEL_PATH = getattr(settings, 'ALS_MODEL_PATH', 'als_factors.npz')
+RECOMMENDATION_UPDATES_DEFERRED = getattr(settings, 'RECOMMENDATION_UPDATES_DEFERRED', True)
+# A published batch outlives the next nightly run, so readers still on the old version keep working
+RECOMMENDATIONS_TIMEOUT = 60 * 60 * 48
+# Highest priority first, as the home page falls back through them
+RECOMMENDATION_SOURCES = ('als', 'collaborative', 'content')
+RECOMMENDATION_LOCAL_SIZE = getattr(settings, 'RECOMMENDATION_LOCAL_SIZE', 10000)
+RECOMMENDATION_LOCAL_TTL = getattr(settings, 'RECOMMENDATION_LOCAL_TTL', 60)
+
+def user_interaction_matrix(user_ids):
+    """
+    Binary users x events matrix of every event a user proposed (approved), viewed or is going to.
+    Returns the CSR matrix with the event id and event type of each column.
+    """
+    user_idx = {user_id: i for i, user_id in enumerate(user_ids)}
+    sources = (
+        Event.objects.filter(status='approved').values_list('proposed_by_id', 'id', 'event_type'),
+        EventView.objects.values_list('user_id', 'event_id', 'event__event_type'),
+        EventParticipation.objects.filter(status='going').values_list('user_id', 'event_id', 'event__event_type'),
+    )
+    rows, cols = [], []
+    event_idx, event_types = {}, []
+    for source in sources:
+        for user_id, event_id, event_type in source.iterator(chunk_size=INTERACTION_CHUNK_SIZE):
+            row = user_idx.get(user_id)
+            if row is None:
+                continue
+            col = event_idx.get(event_id)
+            if col is None:
+                col = event_idx[event_id] = len(event_types)
+                event_types.append(event_type)
+            rows.append(row)
+            cols.append(col)
+
+    matrix = coo_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(user_ids), len(event_types)),
+    ).tocsr()
+    # an event both viewed and joined still counts once
+    matrix.data[:] = 1
+    return matrix, np.fromiter(event_idx, dtype=np.int64, count=len(event_idx)), event_types
+
+def user_rating_matrix(user_ids, event_ids):
+    """Users x events CSR matrix of rating scores, rows and columns in the order given."""
+    user_idx = {user_id: i for i, user_id in enumerate(user_ids)}
+    event_idx = {event_id: i for i, event_id in enumerate(event_ids)}
+    rows, cols, scores = [], [], []
+    ratings = Rating.objects.filter(event_id__in=event_ids).values_list('user_id', 'event_id', 'score')
+    for user_id, event_id, score in ratings.iterator(chunk_size=INTERACTION_CHUNK_SIZE):
+        row = user_idx.get(user_id)
+        if row is not None:
+            rows.append(row)
+            cols.append(event_idx[event_id])
+            scores.append(score)
+    matrix = csr_matrix(
+        (np.array(scores, dtype=np.float32), (rows, cols)),
+        shape=(len(user_ids), len(event_ids)),
+    )
+    matrix.sort_indices()
+    return matrix
+
+def top_k_indices(scores, k):
+    """Column indices of the k highest scores in each row, best first. Scores of 0 or less never qualify and come back as -1."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top[np.take_along_axis(top_scores, order, axis=1) <= 0] = -1
+    return top
+
+def unit_rows(matrix):
+    """Scale each row of a CSR matrix to unit length, all-zero rows stay zero."""
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return matrix.multiply(1 / norms[:, None]).tocsr()
+
+def _save_model(path, write):
+    """
+    Call write(f) on a file beside path, then swap it in with os.replace. A process reloading
+    the model keeps its copy, or its memory map, of the old file and never reads half a new one.
+    """
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as f:
+        write(f)
+    os.replace(temporary, path)
+
+_loaded_models = {}
+
+def _load_saved_model(path, loader):
+    """A model saved at path, reloaded whenever the file changes. None while no file exists."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    loaded = _loaded_models.get(path)
+    if loaded is None or loaded[0] != mtime:
+        loaded = _loaded_models[path] = (mtime, loader(path))
+    return loaded[1]
+
+class UserSimilarityIndex:
+    """
+    Approximate nearest-neighbour index over user rating vectors for cosine similarity.
+    Each of n_tables hash tables signs the vector against n_bits random hyperplanes. Users
+    sharing a signature in any table become candidates, and only candidates are scored exactly.
+    Users without ratings are left out, they would all share the empty signature.
+    """
+    def __init__(self, user_ids, event_ids, vectors, planes, n_bits):
+        self.user_ids = user_ids
+        self.event_ids = event_ids
+        self.vectors = vectors
+        self.planes = planes
+        self.n_bits = n_bits
+        self.user_idx = {user_id: i for i, user_id in enumerate(user_ids.tolist())}
+        codes = self.hash(vectors)
+        # per table, users sorted by signature so a bucket is one searchsorted range
+        self.order = np.argsort(codes, axis=0, kind='stable')
+        self.sorted_codes = np.take_along_axis(codes, self.order, axis=0)
+
+    @classmethod
+    def build(cls, user_ids, event_ids, ratings, n_tables=USER_LSH_TABLES, n_bits=USER_LSH_BITS, seed=0):
+        """Index the rows of a users x events rating matrix, user_ids and event_ids label its rows and columns."""
+        rated = np.diff(ratings.indptr) > 0
+        planes = np.random.default_rng(seed).standard_normal((n_tables * n_bits, len(event_ids))).astype(np.float32)
+        return cls(np.asarray(user_ids)[rated], np.asarray(event_ids), unit_rows(ratings[rated]), planes, n_bits)
+
+    def hash(self, vectors):
+        """Signatures of unit row vectors, one integer column per table."""
+        bits = np.asarray(vectors @ self.planes.T) > 0
+        bits = bits.reshape(bits.shape[0], -1, self.n_bits)
+        return bits @ (1 << np.arange(self.n_bits, dtype=np.int64))
+
+    def query(self, vectors, k, exclude_users=None):
+        """
+        The k most similar indexed users for each row of a unit-normalised CSR matrix, best first, as (user ids, similarities).
+        Missing neighbours are padded with user id -1 and similarity 0. exclude_users optionally
+        names one user per row to leave out, normally the querying user themselves.
+        """
+        codes = self.hash(vectors)
+        n_tables = codes.shape[1]
+        lo = np.empty_like(codes)
+        hi = np.empty_like(codes)
+        for table in range(n_tables):
+            lo[:, table] = np.searchsorted(self.sorted_codes[:, table], codes[:, table], side='left')
+            hi[:, table] = np.searchsorted(self.sorted_codes[:, table], codes[:, table], side='right')
+
+        neighbour_ids = np.full((codes.shape[0], k), -1, dtype=np.int64)
+        similarities = np.zeros((codes.shape[0], k), dtype=np.float32)
+        for row in range(codes.shape[0]):
+            candidates = np.unique(np.concatenate([
+                self.order[lo[row, table]:hi[row, table], table] for table in range(n_tables)
+            ]))
+            if exclude_users is not None:
+                candidates = candidates[self.user_ids[candidates] != exclude_users[row]]
+            if not len(candidates):
+                continue
+            sims = (self.vectors[candidates] @ vectors[row].T).toarray().ravel()
+            top = top_k_indices(sims[None, :], k)[0]
+            top = top[top >= 0]
+            neighbour_ids[row, :len(top)] = self.user_ids[candidates[top]]
+            similarities[row, :len(top)] = sims[top]
+        return neighbour_ids, similarities
+
+    def save(self, path=USER_SIMILARITY_INDEX_PATH):
+        _save_model(path, lambda f: np.savez(
+            f,
+            user_ids=self.user_ids,
+            event_ids=self.event_ids,
+            data=self.vectors.data,
+            indices=self.vectors.indices,
+            indptr=self.vectors.indptr,
+            planes=self.planes,
+            n_bits=self.n_bits,
+        ))
+
+    @classmethod
+    def load(cls, path=USER_SIMILARITY_INDEX_PATH):
+        with np.load(path) as saved:
+            vectors = csr_matrix(
+                (saved['data'], saved['indices'], saved['indptr']),
+                shape=(len(saved['user_ids']), len(saved['event_ids'])),
+            )
+            return cls(saved['user_ids'], saved['event_ids'], vectors, saved['planes'], int(saved['n_bits']))
+
+def get_user_similarity_index():
+    """The saved LSH index, None until the first --ann run has saved one."""
+    return _load_saved_model(USER_SIMILARITY_INDEX_PATH, UserSimilarityIndex.load)
+
+class RecommendationStore:
+    """
+    Per-user recommendation lists in the shared cache, one versioned namespace per source.
+    A batch is written under a fresh version and becomes visible all at once when the source's
+    version pointer is swapped to it; older versions simply expire. Each process keeps a small
+    LRU of recent lookups, and of the pointers, for a few seconds in front of the cache.
+    Batch lists go by source priority. A list refreshed for one user after an interaction is
+    stamped with when it was computed, and wins over higher-priority sources whose lists for
+    that user are all older; the pointer records each batch's time to compare against.
+    """
+    def __init__(self, sources=RECOMMENDATION_SOURCES, local_size=RECOMMENDATION_LOCAL_SIZE, local_ttl=RECOMMENDATION_LOCAL_TTL):
+        self.sources = sources
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self._local = OrderedDict()
+        self._versions = None
+        self._versions_expire = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _pointer_key(source):
+        # Named apart from older pointers holding a bare version, which readers must not follow
+        return f'recommendations:{source}:published'
+
+    @staticmethod
+    def _user_key(source, version, user_id):
+        return f'recommendations:{source}:{version}:{user_id}'
+
+    def versions(self):
+        """Current (version, batch time) per source, None for a source never published."""
+        now = monotonic()
+        with self._lock:
+            if self._versions is not None and now < self._versions_expire:
+                return self._versions
+            generation = self._generation
+        pointers = cache.get_many([self._pointer_key(source) for source in self.sources])
+        versions = tuple(pointers.get(self._pointer_key(source)) for source in self.sources)
+        with self._lock:
+            # A publish that cleared the local copy meanwhile makes what was just read stale
+            if generation == self._generation:
+                self._versions = versions
+                self._versions_expire = now + self.local_ttl
+        return versions
+
+    def publish(self, source, recommendations, batch_size=1000):
+        """Write a full batch of {user id: event ids} for one source, then swap readers over to it."""
+        version = bump_cache_version(f'recommendations:{source}:next_version')
+        # Stamped with when the batch started, the data it was computed from is at least that old
+        published_at = time()
+        items = list(recommendations.items())
+        for start in range(0, len(items), batch_size):
+            cache.set_many({
+                self._user_key(source, version, user_id): (published_at, event_ids)
+                for user_id, event_ids in items[start:start + batch_size]
+            }, timeout=RECOMMENDATIONS_TIMEOUT)
+        cache.set(self._pointer_key(source), (version, published_at), timeout=None)
+        self.clear_local()
+        return version
+
+    def set_user(self, source, user_id, event_ids, updated_at=None):
+        """Replace one user's list in the current version of a source, used by incremental updates."""
+        pointer = self.versions()[self.sources.index(source)]
+        if pointer is None:
+            return  # Nothing published yet, the first batch will cover this user
+        version = pointer[0]
+        entry = (updated_at or time(), event_ids)
+        cache.set(self._user_key(source, version, user_id), entry, timeout=RECOMMENDATIONS_TIMEOUT)
+        with self._lock:
+            for key in [key for key in self._local if key[1] == user_id]:
+                del self._local[key]
+
+    def get(self, user_id):
+        """
+        Event ids of the highest-priority non-empty list for this user, [] if none. A list set
+        for this user alone takes over when it is newer than every non-empty list above it.
+        """
+        versions = self.versions()
+        local_key = (versions, user_id)
+        now = monotonic()
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is not None and now < entry[0]:
+                self._local.move_to_end(local_key)
+                return entry[1]
+
+        keys = {
+            self._user_key(source, pointer[0], user_id): pointer[1]
+            for source, pointer in zip(self.sources, versions) if pointer is not None
+        }
+        found = cache.get_many(list(keys)) if keys else {}
+        event_ids, newest_above = [], None
+        for key, published_at in keys.items():  # In priority order
+            if key not in found or not found[key][1]:
+                continue
+            updated_at, ids = found[key]
+            # Batch lists are stamped with their batch's time, only set_user writes later ones
+            if newest_above is None or (updated_at > published_at and updated_at > newest_above):
+                event_ids = ids
+            newest_above = updated_at if newest_above is None else max(newest_above, updated_at)
+
+        with self._lock:
+            self._local[local_key] = (now + self.local_ttl, event_ids)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+        return event_ids
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+            self._versions = None
+            self._generation += 1
+
+recommendation_store = RecommendationStore()
+
+def content_recommendations(user_id, upcoming, k=3):
+    """
+    Content-based top k for one user: the event-type profile of everything they proposed
+    (approved), viewed or are going to, scored by cosine against the upcoming events.
+    """
+    interacted = Event.objects.filter(proposed_by_id=user_id, status='approved').values_list('id', 'event_type').union(
+        Event.objects.filter(views__user_id=user_id).values_list('id', 'event_type'),
+        Event.objects.filter(participations__user_id=user_id, participations__status='going').values_list('id', 'event_type'),
+    )
+    excluded_ids = set()
+    profile = defaultdict(int)
+    for event_id, event_type in interacted:
+        excluded_ids.add(event_id)
+        profile[event_type] += 1
+
+    norm = sqrt(sum(count * count for count in profile.values())) or 1
+    similarities = np.array([
+        0 if event_id in excluded_ids else profile.get(event_type, 0) / norm
+        for event_id, event_type in upcoming
+    ], dtype=np.float32)
+    return [upcoming[i][0] for i in top_k_indices(similarities[None, :], k)[0] if i >= 0]
+
+def collaborative_recommendations(user_id, upcoming, k=3, neighbours=5, threshold=0.1):
+    """
+    Collaborative top k for one user: upcoming events the most similar raters scored 4 or more.
+    Neighbours come from the saved LSH index, so nothing is returned before one exists.
+    """
+    index = get_user_similarity_index()
+    if index is None:
+        return []
+    event_col = {event_id: i for i, event_id in enumerate(index.event_ids.tolist())}
+    rated = dict(Rating.objects.filter(user_id=user_id).values_list('event_id', 'score'))
+    cols = [event_col[event_id] for event_id in rated if event_id in event_col]
+    if not cols:
+        return []
+    vector = unit_rows(csr_matrix(
+        ([rated[index.event_ids[col]] for col in cols], ([0] * len(cols), cols)),
+        shape=(1, len(index.event_ids)), dtype=np.float32,
+    ))
+    neighbour_ids, similarities = index.query(vector, neighbours, exclude_users=np.array([user_id]))
+    neighbour_ids = neighbour_ids[0][similarities[0] >= threshold].tolist()
+    if not neighbour_ids:
+        return []
+
+    upcoming_idx = {event_id: i for i, (event_id, _) in enumerate(upcoming)}
+    liked = defaultdict(list)
+    for other_id, event_id in Rating.objects.filter(
+        user_id__in=neighbour_ids, score__gte=4, event_id__in=list(upcoming_idx),
+    ).order_by('event_id').values_list('user_id', 'event_id'):
+        if event_id not in rated:
+            liked[other_id].append(event_id)
+
+    recommended = set()
+    for other_id in neighbour_ids:
+        for event_id in liked[other_id]:
+            recommended.add(event_id)
+            if len(recommended) >= k:
+                break
+        if len(recommended) >= k:
+            break
+    return sorted(recommended, key=upcoming_idx.__getitem__)
+
+def update_user_recommendations(user_id, sources=('collaborative', 'content')):
+    """
+    Recompute one user's lists for the given sources into the current published versions,
+    costing one pass over upcoming events instead of a full rebuild. The new lists are
+    stamped now, so the home page serves them ahead of older batch lists.
+    """
+    upcoming = list(
+        Event.objects.filter(status='approved', date__gte=timezone.now()).order_by('id').values_list('id', 'event_type')
+    )
+    updated_at = time()
+    if 'collaborative' in sources and get_user_similarity_index() is not None:
+        recommendation_store.set_user('collaborative', user_id, collaborative_recommendations(user_id, upcoming), updated_at)
+    if 'content' in sources:
+        recommendation_store.set_user('content', user_id, content_recommendations(user_id, upcoming), updated_at)
+
+def _update_user_source(key):
+    user_id, source = key
+    update_user_recommendations(user_id, (source,))
+
+recommendation_update_queue = CoalescingQueue(
+    _update_user_source, 'recommendation-update', deferred=RECOMMENDATION_UPDATES_DEFERRED,
+)
+
+def request_recommendation_update(user_id, source):
+    """
+    Refresh one of a user's recommendation lists outside the request path once the current
+    transaction commits. Interactions arriving while an update is waiting are coalesced into it.
+    """
+    recommendation_update_queue.request((user_id, source))
+
+# The list each kind of interaction feeds: ratings drive collaborative filtering,
+# views and going-participations the content profile
+INTERACTION_SOURCES = {EventView: 'content', EventParticipation: 'content', Rating: 'collaborative'}
+
+@receiver(post_save, sender=EventView)
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_delete, sender=EventParticipation)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def update_recommendations_on_interaction(sender, instance, **kwargs):
+    request_recommendation_update(instance.user_id, INTERACTION_SOURCES[sender])
+
+def feedback_sources(user_id=None):
+    """(user id, event id, weight) querysets for every kind of implicit feedback, optionally for one user."""
+    sources = (
+        EventView.objects.annotate(weight=Value(FEEDBACK_WEIGHTS['view'], FloatField())),
+        EventParticipation.objects.filter(status='going').annotate(weight=Value(FEEDBACK_WEIGHTS['going'], FloatField())),
+        Volunteer.objects.annotate(weight=Value(FEEDBACK_WEIGHTS['volunteer'], FloatField())),
+        Rating.objects.annotate(weight=F('score') * Value(FEEDBACK_WEIGHTS['rating'], FloatField())),
+    )
+    if user_id is not None:
+        sources = tuple(source.filter(user_id=user_id) for source in sources)
+    return sources
+
+def feedback_matrix():
+    """
+    Users x events CSR matrix of summed implicit feedback weights, for every user and event
+    with any interaction. Returns the matrix with the user id and event id of each row and column.
+    """
+    user_idx, event_idx = {}, {}
+    rows, cols, weights = [], [], []
+    for source in feedback_sources():
+        for user_id, event_id, weight in source.values_list('user_id', 'event_id', 'weight').iterator(chunk_size=INTERACTION_CHUNK_SIZE):
+            rows.append(user_idx.setdefault(user_id, len(user_idx)))
+            cols.append(event_idx.setdefault(event_id, len(event_idx)))
+            weights.append(weight)
+    matrix = coo_matrix(
+        (np.array(weights, dtype=np.float32), (rows, cols)),
+        shape=(len(user_idx), len(event_idx)),
+    ).tocsr()
+    return (
+        matrix,
+        np.fromiter(user_idx, dtype=np.int64, count=len(user_idx)),
+        np.fromiter(event_idx, dtype=np.int64, count=len(event_idx)),
+    )
+
+class ItemSimilarityModel:
+    """
+    Each event's most similar events by cosine over who interacted with them and how strongly.
+    The table is one structured .npy file sorted by event id, so it can be memory-mapped and
+    shared read-only by every worker process through the page cache.
+    """
+    def __init__(self, table):
+        self.table = table
+        self.event_ids = table['event_id']
+
+    @staticmethod
+    def dtype(k):
+        return np.dtype([
+            ('event_id', np.int64),
+            ('date', np.float64),
+            ('servable', np.bool_),
+            ('neighbours', np.int64, (k,)),
+            ('similarities', np.float32, (k,)),
+        ])
+
+    @classmethod
+    def build(cls, feedback, event_ids, event_dates, servable, k=ITEM_NEIGHBOURS, chunk_size=512, now=None):
+        """
+        Neighbour table from a users x events feedback matrix whose columns are event_ids.
+        event_dates holds each event's start as a POSIX timestamp and servable marks approved
+        events. Any event can have neighbours, but only servable events not yet started can be one.
+        """
+        now = (now or timezone.now()).timestamp()
+        norms = np.sqrt(feedback.multiply(feedback).sum(axis=0)).A1
+        norms[norms == 0] = 1
+        columns = feedback.multiply(1 / norms[None, :]).tocsc()
+        rows = columns.T.tocsr()
+        # past or unapproved events can never be recommended, keep them from taking neighbour slots
+        columns = columns @ diags((servable & (event_dates >= now)).astype(np.float32))
+
+        neighbours = np.full((len(event_ids), k), -1, dtype=np.int64)
+        scores = np.zeros((len(event_ids), k), dtype=np.float32)
+        # events x events similarity, only chunk_size rows of it at a time
+        for start in range(0, len(event_ids), chunk_size):
+            similarities = (rows[start:start + chunk_size] @ columns).toarray()
+            chunk = slice(start, start + similarities.shape[0])
+            chunk_rows = np.arange(similarities.shape[0])
+            similarities[chunk_rows, chunk_rows + start] = 0
+            top = top_k_indices(similarities, k)
+            found = top >= 0
+            neighbours[chunk, :top.shape[1]] = np.where(found, event_ids[top], -1)
+            scores[chunk, :top.shape[1]] = np.where(found, np.take_along_axis(similarities, np.maximum(top, 0), axis=1), 0)
+
+        order = np.argsort(event_ids)
+        table = np.empty(len(event_ids), dtype=cls.dtype(k))
+        table['event_id'] = event_ids[order]
+        table['date'] = event_dates[order]
+        table['servable'] = servable[order]
+        table['neighbours'] = neighbours[order]
+        table['similarities'] = scores[order]
+        return cls(table)
+
+    def save(self, path=ITEM_SIMILARITY_PATH):
+        _save_model(path, lambda f: np.save(f, self.table))
+
+    @classmethod
+    def load(cls, path=ITEM_SIMILARITY_PATH):
+        return cls(np.load(path, mmap_mode='r'))
+
+    def recommend(self, event_ids, weights, exclude=(), k=10, now=None):
+        """
+        Approved events still to come, scored by the summed, weighted similarity to the given
+        events, best first. Only the neighbour rows of those events and of the candidates are
+        read from the table.
+        """
+        event_ids = np.asarray(event_ids, dtype=np.int64)
+        rows = np.searchsorted(self.event_ids, event_ids)
+        known = rows < len(self.event_ids)
+        known[known] = self.event_ids[rows[known]] == event_ids[known]
+        if not known.any():
+            return []
+        rows = rows[known]
+        neighbours = self.table['neighbours'][rows].ravel()
+        scores = (self.table['similarities'][rows] * np.asarray(weights, dtype=np.float32)[known, None]).ravel()
+
+        candidates, inverse = np.unique(neighbours, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores, minlength=len(candidates))
+        candidate_rows = np.searchsorted(self.event_ids, candidates)
+        candidate_rows[candidates < 0] = 0
+        servable = self.table['servable'][candidate_rows] & (self.table['date'][candidate_rows] >= (now or timezone.now()).timestamp())
+        totals[(candidates < 0) | ~servable] = 0
+        totals[np.isin(candidates, np.asarray(list(exclude), dtype=np.int64))] = 0
+        top = top_k_indices(totals[None, :], k)[0]
+        return candidates[top[top >= 0]].tolist()
+
+def get_item_similarity_model():
+    """The saved item-item model, None until compute_item_similarity has run."""
+    return _load_saved_model(ITEM_SIMILARITY_PATH, ItemSimilarityModel.load)
+
+def item_recommendations(user_id, k=10):
+    """Events similar to what the user most recently viewed, joined, volunteered for or rated, from the item-item model."""
+    model = get_item_similarity_model()
+    if model is None:
+        return []
+    views, going, volunteering, ratings = feedback_sources(user_id)
+    interactions = list(views.values_list('event_id', 'weight', 'viewed_at').union(
+        going.values_list('event_id', 'weight', 'created_at'),
+        volunteering.values_list('event_id', 'weight', 'signup_date'),
+        ratings.values_list('event_id', 'weight', 'created_at'),
+        all=True,
+    ).order_by('-viewed_at'))
+    if not interactions:
+        return []
+    # the most recent interactions drive the scores, everything the user touched is excluded
+    recent = interactions[:ITEM_RECENT_INTERACTIONS]
+    return model.recommend(
+        [event_id for event_id, _, _ in recent],
+        [weight for _, weight, _ in recent],
+        exclude={event_id for event_id, _, _ in interactions},
+        k=k,
+    )
+
+def event_schedule(event_ids):
+    """Start time as a POSIX timestamp and approval flag for each of event_ids, in that order."""
+    event_idx = {event_id: i for i, event_id in enumerate(event_ids.tolist())}
+    event_dates = np.zeros(len(event_ids), dtype=np.float64)
+    servable = np.zeros(len(event_ids), dtype=bool)
+    for event_id, date, status in Event.objects.values_list('id', 'date', 'status').iterator(chunk_size=INTERACTION_CHUNK_SIZE):
+        i = event_idx.get(event_id)
+        if i is not None:
+            event_dates[i] = date.timestamp()
+            servable[i] = status == 'approved'
+    return event_dates, servable
+
+def _als_half_step(feedback, fixed, regularization, alpha, max_nnz):
+    """
+    Solve every row's factors against the fixed other side, for implicit feedback with
+    confidence 1 + alpha * weight (Hu, Koren & Volinsky). Consecutive rows holding up to
+    max_nnz interactions between them are solved together as one stacked np.linalg.solve.
+    """
+    n_factors = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(n_factors, dtype=fixed.dtype)
+    solved = np.zeros((feedback.shape[0], n_factors), dtype=fixed.dtype)
+    indptr = feedback.indptr
+    start = 0
+    while start < feedback.shape[0]:
+        end = max(int(np.searchsorted(indptr, indptr[start] + max_nnz, side='right')) - 1, start + 1)
+        end = min(end, feedback.shape[0])
+        block = feedback[start:end]
+        factors = fixed[block.indices]
+        weighted = (alpha * block.data).astype(fixed.dtype)[:, None] * factors
+
+        # A = YtY + Yt(C - I)Y + lambda*I and b = YtCp, summed per row over its own items only
+        if end - start == 1:
+            # a single heavy row, skip materialising its outer products
+            lhs = (gram + weighted.T @ factors)[None]
+            rhs = (weighted + factors).sum(axis=0)[None]
+        else:
+            counts = np.diff(block.indptr)
+            lhs = np.broadcast_to(gram, (len(counts), n_factors, n_factors)).copy()
+            rhs = np.zeros((len(counts), n_factors), dtype=fixed.dtype)
+            rated = counts > 0
+            if rated.any():
+                offsets = block.indptr[:-1][rated]
+                lhs[rated] += np.add.reduceat(weighted[:, :, None] * factors[:, None, :], offsets, axis=0)
+                rhs[rated] = np.add.reduceat(weighted + factors, offsets, axis=0)
+        solved[start:end] = np.linalg.solve(lhs, rhs[:, :, None])[:, :, 0]
+        start = end
+    return solved
+
+class ImplicitALSModel:
+    """
+    Matrix factorisation of the implicit feedback matrix by alternating least squares.
+    A user's score for every upcoming event is one product of the event factors with
+    the user's factor vector.
+    """
+    def __init__(self, user_ids, event_ids, user_factors, event_factors, event_dates, servable, seen_indptr, seen_indices):
+        self.user_ids = user_ids
+        self.event_ids = event_ids
+        self.user_factors = user_factors
+        self.event_factors = event_factors
+        self.event_dates = event_dates
+        self.servable = servable
+        self.seen_indptr = seen_indptr
+        self.seen_indices = seen_indices
+        self.user_idx = {user_id: i for i, user_id in enumerate(user_ids.tolist())}
+
+    @classmethod
+    def train(cls, feedback, user_ids, event_ids, event_dates, servable,
+              factors=32, iterations=10, regularization=0.1, alpha=10.0, max_nnz=20000, seed=0, log=None):
+        """
+        feedback is users x events, labelled by user_ids and event_ids. event_dates holds each
+        event's start as a POSIX timestamp and servable marks the events that may be recommended.
+        """
+        rng = np.random.default_rng(seed)
+        user_factors = (rng.standard_normal((feedback.shape[0], factors)) * 0.01).astype(np.float32)
+        event_factors = (rng.standard_normal((feedback.shape[1], factors)) * 0.01).astype(np.float32)
+        by_event = feedback.T.tocsr()
+        for iteration in range(iterations):
+            user_factors = _als_half_step(feedback, event_factors, regularization, alpha, max_nnz)
+            event_factors = _als_half_step(by_event, user_factors, regularization, alpha, max_nnz)
+            if log:
+                log(iteration + 1)
+        return cls(
+            user_ids, event_ids, user_factors, event_factors, event_dates, servable,
+            feedback.indptr.astype(np.int32), feedback.indices.astype(np.int32),
+        )
+
+    def save(self, path=ALS_MODEL_PATH):
+        _save_model(path, lambda f: np.savez(
+            f,
+            user_ids=self.user_ids,
+            event_ids=self.event_ids,
+            user_factors=self.user_factors,
+            event_factors=self.event_factors,
+            event_dates=self.event_dates,
+            servable=self.servable,
+            seen_indptr=self.seen_indptr,
+            seen_indices=self.seen_indices,
+        ))
+
+    @classmethod
+    def load(cls, path=ALS_MODEL_PATH):
+        with np.load(path) as saved:
+            return cls(**{name: saved[name] for name in saved.files})
+
+    def recommend(self, user_id, k=10, now=None):
+        """Top k servable events still to come that the user has not interacted with, best first."""
+        row = self.user_idx.get(user_id)
+        if row is None:
+            return []
+        now = (now or timezone.now()).timestamp()
+        candidates = self.servable & (self.event_dates >= now)
+        candidates[self.seen_indices[self.seen_indptr[row]:self.seen_indptr[row + 1]]] = False
+        candidates = np.flatnonzero(candidates)
+        if not len(candidates):
+            return []
+        scores = self.event_factors[candidates] @ self.user_factors[row]
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self.event_ids[candidates[top]].tolist()
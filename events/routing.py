@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/group-chat/(?P<chat_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/todo/(?P<event_id>\d+)/$', consumers.TaskBoardConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,89 @@
+from django.db import connections
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context, shared_memory
+import logging
+
+from scipy.sparse import csr_matrix
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def csr_parts(prefix, matrix):
+    """A CSR matrix as plain named arrays, for share_arrays."""
+    return {
+        f'{prefix}_data': matrix.data,
+        f'{prefix}_indices': matrix.indices,
+        f'{prefix}_indptr': matrix.indptr,
+        f'{prefix}_shape': np.array(matrix.shape, dtype=np.int64),
+    }
+
+def csr_from_parts(arrays, prefix):
+    """Rebuild a CSR matrix from csr_parts arrays without copying them."""
+    return csr_matrix(
+        (arrays[f'{prefix}_data'], arrays[f'{prefix}_indices'], arrays[f'{prefix}_indptr']),
+        shape=tuple(arrays[f'{prefix}_shape']),
+    )
+
+def share_arrays(arrays):
+    """Copy named arrays into shared memory. Returns the segments and a picklable spec to attach them by."""
+    segments, spec = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        segments.append(segment)
+        spec[name] = (segment.name, array.shape, array.dtype.str)
+    return segments, spec
+
+_shared_segments = []
+_shared_arrays = {}
+
+def _attach_shared_arrays(spec):
+    for name, (segment_name, shape, dtype) in spec.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        _shared_segments.append(segment)
+        _shared_arrays[name] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+def shared_arrays():
+    """Inside a run_sharded worker: the arrays the parent shared, by name."""
+    return _shared_arrays
+
+def _run_serial(worker, n_rows, arrays):
+    # Same worker, same shared_arrays() lookup, just in this process
+    _shared_arrays.update(arrays)
+    try:
+        return [worker(0, n_rows)]
+    finally:
+        _shared_arrays.clear()
+
+def run_sharded(worker, n_rows, workers, arrays, shards_per_worker=4):
+    """
+    Call worker(start, end) over consecutive row shards in a pool of worker processes and
+    return the results in shard order. arrays are placed in shared memory once and attached
+    by every process when it starts, rather than pickled into each task.
+    Workers are forked, so they inherit the configured Django app. Where fork is unavailable
+    (Windows) the whole range runs as one shard in this process instead.
+    """
+    if n_rows == 0:
+        return []
+    if 'fork' not in get_all_start_methods():
+        logger.warning("fork is not available on this platform, running %d rows in a single process", n_rows)
+        return _run_serial(worker, n_rows, arrays)
+
+    shard_size = max(1, -(-n_rows // (workers * shards_per_worker)))
+    segments, spec = share_arrays(arrays)
+    try:
+        # Forked children must not reuse the parent's database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context('fork'),
+            initializer=_attach_shared_arrays,
+            initargs=(spec,),
+        ) as pool:
+            futures = [pool.submit(worker, start, min(start + shard_size, n_rows)) for start in range(0, n_rows, shard_size)]
+            return [future.result() for future in futures]
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
@@ -1,3 +1,808 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from scipy.sparse import csr_matrix
+
+from django.db import IntegrityError
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import DEFAULT_EVENT_DURATION, Event, EventParticipation, EventView, Rating, Task, Venue, VenueBooking, VenueUtilization, Volunteer
+from .consumers import TaskBoardConsumer
+from .management.commands.compute_recommendations import _score_shard, score_users
+from .recommendations import ImplicitALSModel, ItemSimilarityModel, RecommendationStore, UserSimilarityIndex, top_k_indices, unit_rows, user_interaction_matrix, recommendation_store, recommendation_update_queue
+from .sharding import csr_parts, run_sharded, shared_arrays
+from .views import MAX_FREE_SLOT_DAYS
+from .utils import CoalescingQueue, VenueAvailabilityIndex, allocate_venue, allocate_venues, book_venue, find_free_slots, find_nearby_events, get_task_suggestions, get_venue_table, get_volunteer_vectors, serialize_task, solve_task_assignment
+
+def at(hour):
+    return timezone.make_aware(datetime(2030, 1, 1)) + timedelta(hours=hour)
+
+class VenueAvailabilityIndexTests(SimpleTestCase):
+    def test_touching_intervals_are_free(self):
+        index = VenueAvailabilityIndex([(1, at(10), at(12))])
+        self.assertTrue(index.is_free(1, at(12), at(14)))
+        self.assertTrue(index.is_free(1, at(8), at(10)))
+        self.assertFalse(index.is_free(1, at(11), at(13)))
+        self.assertFalse(index.is_free(1, at(9), at(11)))
+
+    def test_nested_intervals(self):
+        # The short booking starts last, the long one still covers the query
+        index = VenueAvailabilityIndex([(1, at(10), at(18)), (1, at(11), at(12))])
+        self.assertFalse(index.is_free(1, at(13), at(14)))
+        self.assertFalse(index.is_free(1, at(9), at(20)))
+        self.assertTrue(index.is_free(1, at(18), at(19)))
+
+    def test_other_venues_and_empty_index(self):
+        index = VenueAvailabilityIndex([(1, at(10), at(12))])
+        self.assertTrue(index.is_free(2, at(10), at(12)))
+        self.assertTrue(VenueAvailabilityIndex().is_free(1, at(10), at(12)))
+        self.assertEqual(index.free_venues([1, 2], at(11), at(13)), [2])
+
+    def test_add(self):
+        index = VenueAvailabilityIndex()
+        index.add(1, at(10), at(12))
+        self.assertFalse(index.is_free(1, at(11), at(12)))
+        self.assertTrue(index.is_free(1, at(12), at(13)))
+        index.add(1, at(6), at(8))
+        self.assertFalse(index.is_free(1, at(7), at(9)))
+        self.assertTrue(index.is_free(1, at(8), at(10)))
+
+class CoalescingQueueTests(TestCase):
+    def test_waiting_keys_coalesce_and_can_be_taken_over(self):
+        handler = mock.Mock()
+        queue = CoalescingQueue(handler, 'test-queue')
+        with mock.patch.object(queue._executor, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            queue.request(1)
+            queue.request(1)
+            queue.request(2)
+        self.assertEqual([call.args[1] for call in submit.call_args_list], [1, 2])
+
+        queue.discard(1)  # as a synchronous run does
+        for call in submit.call_args_list:
+            call.args[0](*call.args[1:])
+        handler.assert_called_once_with(2)
+
+class BookVenueTests(TestCase):
+    def setUp(self):
+        self.venue = Venue.objects.create(name="Hall", capacity=100, latitude=27.69, longitude=85.29)
+
+    def event(self, start, end):
+        return Event.objects.create(title="Event", description="", date=at(start), end_date=at(end))
+
+    def test_overlapping_booking_raises(self):
+        book_venue(self.event(10, 12), self.venue)
+        with self.assertRaises(IntegrityError):
+            book_venue(self.event(11, 13), self.venue)
+        self.assertEqual(VenueBooking.objects.count(), 1)
+
+    def test_touching_booking_is_allowed(self):
+        book_venue(self.event(10, 12), self.venue)
+        book_venue(self.event(12, 14), self.venue)
+        self.assertEqual(VenueBooking.objects.count(), 2)
+
+    def test_open_ended_event_holds_the_default_duration(self):
+        open_ended = Event.objects.create(title="Open", description="", date=at(10))
+        booking = book_venue(open_ended, self.venue)
+        self.assertEqual((booking.start_time, booking.end_time), (at(10), at(10 + DEFAULT_EVENT_DURATION)))
+        with self.assertRaises(IntegrityError):
+            book_venue(self.event(11, 12), self.venue)
+
+class AllocateVenuesTests(TestCase):
+    def test_places_events_greedy_order_fails_on(self):
+        # The small event scores the big hall best, because the small room is far away.
+        # Placed first, it would leave the large event nowhere to go.
+        hall = Venue.objects.create(name="Hall", capacity=100, latitude=27.69, longitude=85.29)
+        room = Venue.objects.create(name="Room", capacity=20, latitude=1.0, longitude=1.0)
+        small = Event.objects.create(title="Small", description="", date=at(10), end_date=at(12),
+                                     expected_attendees=10, status='approved')
+        large = Event.objects.create(title="Large", description="", date=at(11), end_date=at(13),
+                                     expected_attendees=90, status='approved')
+
+        self.assertEqual(allocate_venues([small, large]), {small.id: True, large.id: True})
+        small.refresh_from_db()
+        large.refresh_from_db()
+        self.assertEqual(small.venue, room)
+        self.assertEqual(large.venue, hall)
+        self.assertEqual(VenueBooking.objects.count(), 2)
+
+class AllocateVenueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.near = Venue.objects.create(name="Near", capacity=50, latitude=27.69, longitude=85.29)
+        self.far = Venue.objects.create(name="Far", capacity=50, latitude=27.75, longitude=85.35)
+        self.huge = Venue.objects.create(name="Huge", capacity=500, latitude=27.689, longitude=85.2898)
+
+    def event(self, attendees, venue=None, start=10):
+        return Event.objects.create(title="Event", description="", date=at(start), end_date=at(start + 2),
+                                    expected_attendees=attendees, venue=venue, status='approved')
+
+    def assertAllocated(self, event, venue):
+        event.refresh_from_db()
+        self.assertEqual(event.venue, venue)
+        self.assertEqual(list(VenueBooking.objects.filter(event=event).values_list('venue', flat=True)), [venue.id])
+
+    def test_keeps_a_manual_venue_that_fits(self):
+        event = self.event(45, venue=self.far)
+        self.assertTrue(allocate_venue(event))
+        self.assertAllocated(event, self.far)
+
+    def test_reconsiders_an_oversized_manual_venue(self):
+        event = self.event(40, venue=self.huge)
+        self.assertTrue(allocate_venue(event))
+        self.assertAllocated(event, self.near)
+
+    def test_picks_the_best_scoring_free_venue(self):
+        Venue.objects.create(name="Small", capacity=20, latitude=27.6887, longitude=85.2898)
+        table = get_venue_table()
+        self.assertEqual(table.rank(45), [self.near.id, self.far.id, self.huge.id])
+        first = self.event(45)
+        self.assertTrue(allocate_venue(first))
+        self.assertAllocated(first, self.near)
+        # The nearest venue is now taken for the overlapping hours
+        second = self.event(45, start=11)
+        self.assertTrue(allocate_venue(second))
+        self.assertAllocated(second, self.far)
+
+    def test_moves_on_when_a_booking_is_taken_concurrently(self):
+        event = self.event(45)
+        real_book_venue = book_venue
+
+        def book(event, venue):
+            if venue == self.near:
+                raise IntegrityError("taken")
+            return real_book_venue(event, venue)
+
+        with mock.patch('events.utils.book_venue', side_effect=book) as booked:
+            self.assertTrue(allocate_venue(event))
+        self.assertEqual([call.args[1] for call in booked.call_args_list], [self.near, self.far])
+        self.assertAllocated(event, self.far)
+
+    def test_clears_the_venue_when_nothing_fits(self):
+        event = self.event(1000, venue=self.huge)
+        self.assertFalse(allocate_venue(event))
+        event.refresh_from_db()
+        self.assertIsNone(event.venue)
+        self.assertFalse(VenueBooking.objects.exists())
+
+class ChangedFieldsTests(TestCase):
+    def test_unsaved_event_reports_every_field(self):
+        event = Event(title="Event", description="", date=at(10))
+        self.assertEqual(set(event.changed_fields()), set(Event.TRACKED_FIELDS))
+
+    def test_after_save(self):
+        event = Event.objects.create(title="Event", description="", date=at(10))
+        self.assertEqual(event.changed_fields(), {})
+        event.status = 'approved'
+        self.assertEqual(event.changed_fields(), {'status': 'pending'})
+        event.save()
+        self.assertEqual(event.changed_fields(), {})
+
+    def test_after_from_db(self):
+        Event.objects.create(title="Event", description="", date=at(10), expected_attendees=5)
+        event = Event.objects.get()
+        self.assertEqual(event.changed_fields(), {})
+        event.expected_attendees = 50
+        event.title = "Untracked"
+        self.assertEqual(event.changed_fields(), {'expected_attendees': 5})
+
+@mock.patch('events.utils.request_venue_allocation')
+class AllocationReceiverTests(TestCase):
+    def test_fires_on_pending_to_approved_only(self, request_allocation):
+        event = Event.objects.create(title="Event", description="", date=at(10))
+        request_allocation.assert_not_called()
+
+        event.title = "Renamed"
+        event.save()
+        request_allocation.assert_not_called()
+
+        event.status = 'approved'
+        event.save()
+        request_allocation.assert_called_once_with(event)
+
+        event.title = "Renamed again"
+        event.save()
+        request_allocation.assert_called_once()
+
+    def test_rejection_does_not_fire(self, request_allocation):
+        event = Event.objects.create(title="Event", description="", date=at(10))
+        event.status = 'rejected'
+        event.save()
+        request_allocation.assert_not_called()
+
+class FreeSlotsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.venue = Venue.objects.create(name="Hall", capacity=100, latitude=27.69, longitude=85.29)
+        self.day = at(0).date()
+
+    def free_slots(self, day):
+        return find_free_slots(day, day, 50, timedelta(hours=1))
+
+    def test_moved_booking_frees_its_old_day(self):
+        event = Event.objects.create(title="Event", description="", date=at(0), end_date=at(24))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = book_venue(event, self.venue)
+        self.assertEqual(self.free_slots(self.day), [])
+
+        event.date, event.end_date = at(48), at(50)
+        event.save()
+        booking = VenueBooking.objects.get(pk=booking.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(self.free_slots(self.day)[0]['slots'], [(at(0), at(24))])
+
+    def test_invalidated_only_once_the_booking_commits(self):
+        self.assertEqual(self.free_slots(self.day)[0]['slots'], [(at(0), at(24))])
+        event = Event.objects.create(title="Event", description="", date=at(10), end_date=at(12))
+        with self.captureOnCommitCallbacks() as callbacks:
+            book_venue(event, self.venue)
+            # Another request recomputing now would read the old rows, it must not cache them as current
+            self.assertEqual(self.free_slots(self.day)[0]['slots'], [(at(0), at(24))])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.free_slots(self.day)[0]['slots'], [(at(0), at(10)), (at(12), at(24))])
+
+    def test_open_ended_booking_is_busy(self):
+        book_venue(Event.objects.create(title="Open", description="", date=at(10)), self.venue)
+        self.assertEqual(self.free_slots(self.day)[0]['slots'], [(at(0), at(10)), (at(10 + DEFAULT_EVENT_DURATION), at(24))])
+
+    def test_venue_change_refreshes_every_day(self):
+        self.assertEqual(self.free_slots(self.day)[0]['name'], "Hall")
+        self.venue.name = "Main hall"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.venue.save()
+        self.assertEqual(self.free_slots(self.day)[0]['name'], "Main hall")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.venue.delete()
+        self.assertEqual(self.free_slots(self.day), [])
+
+class FreeSlotsViewTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create(username="planner"))
+
+    def test_rejects_unbounded_durations(self):
+        for duration in ['inf', 'nan', '1e300', '0', str(MAX_FREE_SLOT_DAYS * 24 + 1)]:
+            response = self.client.get(reverse('venue_free_slots'), {'start': '2030-01-01', 'duration': duration})
+            self.assertEqual(response.status_code, 400, duration)
+
+    def test_longest_duration(self):
+        response = self.client.get(reverse('venue_free_slots'), {'start': '2030-01-01', 'duration': MAX_FREE_SLOT_DAYS * 24})
+        self.assertEqual(response.status_code, 200)
+
+class VenueUtilizationTests(TestCase):
+    def setUp(self):
+        self.hall = Venue.objects.create(name="Hall", capacity=100, latitude=27.69, longitude=85.29)
+        self.week = at(0).date() - timedelta(days=at(0).weekday())
+
+    def utilization(self):
+        return {
+            (row.venue_id, row.week_start): (row.booked_hours, np.array(row.hourly_heatmap))
+            for row in VenueUtilization.objects.all()
+        }
+
+    def book(self, start, end):
+        event = Event.objects.create(title="Event", description="", date=at(start), end_date=at(end))
+        return event, book_venue(event, self.hall)
+
+    def test_booking_adds_its_hours(self):
+        self.book(10, 12)
+        self.book(12, 15)
+        hours, heatmap = self.utilization()[(self.hall.id, self.week)]
+        self.assertEqual(hours, 5)
+        self.assertEqual(heatmap[at(0).weekday(), 9:16].tolist(), [0, 1, 1, 1, 1, 1, 0])
+
+    def test_moved_booking_takes_back_its_old_hours(self):
+        event, booking = self.book(10, 12)
+        event.date, event.end_date = at(24 * 7 + 10), at(24 * 7 + 13)
+        event.save()
+        VenueBooking.objects.get(pk=booking.pk).save()  # Loaded from the database, so _loaded_slot holds the old slot
+        utilization = self.utilization()
+        self.assertEqual(utilization[(self.hall.id, self.week)][0], 0)
+        self.assertEqual(utilization[(self.hall.id, self.week + timedelta(days=7))][0], 3)
+
+    def test_deleted_booking_takes_back_its_hours(self):
+        self.book(10, 12)
+        _, booking = self.book(20, 21)
+        booking.delete()
+        self.assertEqual(self.utilization()[(self.hall.id, self.week)][0], 2)
+
+    def test_bulk_allocation_adds_hours_on_commit(self):
+        events = [
+            Event.objects.create(title="Event", description="", date=at(start), end_date=at(start + 2),
+                                 expected_attendees=10, status='approved')
+            for start in [10, 30]
+        ]
+        with self.captureOnCommitCallbacks() as callbacks:
+            allocate_venues(events)
+        self.assertEqual(self.utilization(), {})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.utilization()[(self.hall.id, self.week)][0], 4)
+
+    def test_rebuild_matches_the_incremental_rows(self):
+        room = Venue.objects.create(name="Room", capacity=20, latitude=27.7, longitude=85.3)
+        event, booking = self.book(22, 26)  # Crosses midnight
+        self.book(24 * 5 + 20, 24 * 5 + 30)  # Sunday night into the next week
+        book_venue(Event.objects.create(title="Event", description="", date=at(9), end_date=at(10)), room)
+        event.date, event.end_date = at(1), at(3)
+        event.save()
+        VenueBooking.objects.get(pk=booking.pk).save()
+        incremental = {key: value for key, value in self.utilization().items() if value[0]}
+        self.assertEqual(len(incremental), 3)
+
+        with redirect_stdout(io.StringIO()):
+            call_command('compute_venue_utilization', chunk_size=1)
+        rebuilt = self.utilization()
+        self.assertEqual(sorted(rebuilt), sorted(incremental))
+        for key, (hours, heatmap) in rebuilt.items():
+            self.assertAlmostEqual(hours, incremental[key][0])
+            np.testing.assert_allclose(heatmap, incremental[key][1])
+
+class NearbyEventsTests(TestCase):
+    def test_radius_not_bounding_box(self):
+        # 1 km around (27.69, 85.29): the corner venue is inside the bounding box but 1.18 km away
+        venues = {
+            name: Venue.objects.create(name=name, capacity=100, latitude=latitude, longitude=longitude)
+            for name, latitude, longitude in [
+                ("near", 27.69, 85.295), ("nearest", 27.691, 85.29), ("corner", 27.6975, 85.2985), ("far", 27.78, 85.29),
+            ]
+        }
+        events = {
+            name: Event.objects.create(title=name, description="", date=at(10), end_date=at(12), status='approved', venue=venue)
+            for name, venue in venues.items()
+        }
+        Event.objects.create(title="pending", description="", date=at(10), status='pending', venue=venues["near"])
+        Event.objects.create(title="later", description="", date=at(30), status='approved', venue=venues["near"])
+
+        nearby = find_nearby_events(27.69, 85.29, 1, at(0), at(24))
+        self.assertEqual([event for event, _ in nearby], [events["nearest"], events["near"]])
+        self.assertAlmostEqual(nearby[0][1], 0.111, places=3)
+        self.assertEqual(find_nearby_events(0, 0, 1, at(0), at(24)), [])
+
+class VolunteerCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(title="Event", description="", date=at(10))
+        self.volunteers = [
+            Volunteer.objects.create(event=self.event, user=User.objects.create(username=name), hobbies_interests=interests)
+            for name, interests in [("a", "photography cameras"), ("b", "cooking food"), ("c", "music guitar")]
+        ]
+
+    def test_vector_rows_follow_the_callers_order(self):
+        _, forward = get_volunteer_vectors(self.event, self.volunteers)
+        with mock.patch('events.utils.TfidfVectorizer') as vectorizer:
+            _, backward = get_volunteer_vectors(self.event, self.volunteers[::-1])
+        vectorizer.assert_not_called()
+        self.assertEqual((forward[::-1] != backward).nnz, 0)
+
+    def test_task_suggestions_ignore_volunteer_order(self):
+        tasks = [Task.objects.create(event=self.event, description="Take photos")]
+        suggestions = get_task_suggestions(self.volunteers, tasks, self.event)
+        self.assertEqual(suggestions, {"Take photos": self.volunteers[0]})
+        with mock.patch('events.utils.suggest_task_assignments') as suggest:
+            self.assertEqual(get_task_suggestions(self.volunteers[::-1], tasks, self.event), suggestions)
+        suggest.assert_not_called()
+
+    def test_volunteers_approved_without_a_signal_miss_the_cache(self):
+        tasks = [Task.objects.create(event=self.event, description="Prepare food")]
+        self.assertEqual(get_task_suggestions(self.volunteers[:1], tasks, self.event), {"Prepare food": self.volunteers[0]})
+        # As the admin's approve action does: no post_save, so no version bump
+        Volunteer.objects.filter(pk=self.volunteers[1].pk).update(is_approved=True)
+        self.assertEqual(get_task_suggestions(self.volunteers[:2], tasks, self.event), {"Prepare food": self.volunteers[1]})
+
+class BulkTasksTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.host = User.objects.create(username="host")
+        self.event = Event.objects.create(title="Event", description="", date=at(10), status='approved', proposed_by=self.host)
+        self.volunteer = Volunteer.objects.create(event=self.event, user=User.objects.create(username="vol"),
+                                                  hobbies_interests="photography cameras", is_approved=True)
+        self.tasks = [Task.objects.create(event=self.event, description=description) for description in ["Set up", "Clean up"]]
+        self.client.force_login(self.host)
+
+    def post(self, body):
+        body = body if isinstance(body, str) else json.dumps(body)
+        return self.client.post(reverse('bulk_tasks', args=[self.event.id]), body, content_type='application/json')
+
+    def test_invalid_operation_writes_nothing(self):
+        for body in [
+            "not json",
+            {'operations': {}},
+            {'operations': [{'op': 'create', 'description': "New"}, {'op': 'rename'}]},
+            {'operations': [{'op': 'delete', 'task_id': self.tasks[0].id}, {'op': 'edit', 'task_id': self.tasks[0].id, 'description': "x"}]},
+            {'operations': [{'op': 'assign', 'task_id': self.tasks[0].id, 'volunteer_id': 0}]},
+            {'operations': [{'op': 'edit', 'task_id': self.tasks[0].id, 'description': " "}]},
+        ]:
+            response = self.post(body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', response.json())
+        self.assertEqual(sorted(Task.objects.values_list('description', flat=True)), ["Clean up", "Set up"])
+
+    def test_only_the_host_can_manage_tasks(self):
+        self.client.force_login(self.volunteer.user)
+        self.assertEqual(self.post({'operations': [{'op': 'delete', 'task_id': self.tasks[0].id}]}).status_code, 403)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_operations_and_accepted_suggestions(self):
+        response = self.post({
+            'operations': [
+                {'op': 'create', 'description': "Take photos"},
+                {'op': 'edit', 'task_id': self.tasks[0].id, 'description': "Set up chairs"},
+                {'op': 'delete', 'task_id': self.tasks[1].id},
+            ],
+            'accept_suggestions': True,
+        })
+        self.assertEqual(response.status_code, 200)
+        tasks = {task['description']: task for task in response.json()['tasks']}
+        self.assertEqual(sorted(tasks), ["Set up chairs", "Take photos"])
+        self.assertEqual(tasks["Take photos"]['volunteer_user_id'], self.volunteer.user_id)
+        self.assertEqual(Task.objects.get(description="Take photos").volunteer, self.volunteer)
+        self.assertFalse(Task.objects.filter(id=self.tasks[1].id).exists())
+
+class SolveTaskAssignmentTests(SimpleTestCase):
+    def test_slots_spread_the_load(self):
+        counts = lambda assigned: np.bincount(assigned, minlength=3).tolist()
+        self.assertEqual(counts(solve_task_assignment(6, np.zeros(3), np.zeros(3))), [2, 2, 2])
+        self.assertEqual(counts(solve_task_assignment(4, np.array([2, 0, 0]), np.zeros(3))), [0, 2, 2])
+        # Communication cost only breaks the tie for the odd task out
+        self.assertEqual(counts(solve_task_assignment(4, np.zeros(3), np.array([1.0, 0, 1.0]))), [1, 2, 1])
+
+    def test_match_scores_pull_tasks_to_the_matching_volunteer(self):
+        match_scores = np.array([[0.0, 1.0], [1.0, 0.0]])
+        self.assertEqual(solve_task_assignment(2, np.zeros(2), np.zeros(2), match_scores).tolist(), [1, 0])
+        # A good match does not outweigh a much longer queue
+        self.assertEqual(solve_task_assignment(1, np.array([5, 0]), np.zeros(2), np.array([[1.0], [0.0]])).tolist(), [1])
+
+class TaskBoardTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create(username="host")
+        self.event = Event.objects.create(title="Event", description="", date=at(10), status='approved', proposed_by=self.host)
+        self.volunteer = Volunteer.objects.create(event=self.event, user=User.objects.create(username="vol"),
+                                                  hobbies_interests="photography", is_approved=True)
+        self.task = Task.objects.create(event=self.event, description="Take photos", volunteer=self.volunteer)
+
+    def test_volunteer_page_can_rebuild_their_status_button(self):
+        self.client.force_login(self.volunteer.user)
+        response = self.client.get(reverse('todo', args=[self.event.id]))
+        self.assertContains(response, 'id="task-status-template"')
+        self.assertContains(response, 'name="update_status"', count=2)
+        self.assertNotContains(response, 'id="task-manage-template"')
+        self.assertEqual(serialize_task(self.task)['volunteer_user_id'], self.volunteer.user_id)
+
+    def test_host_page_can_rebuild_the_management_panel(self):
+        self.client.force_login(self.host)
+        response = self.client.get(reverse('todo', args=[self.event.id]))
+        self.assertContains(response, 'id="task-manage-template"')
+        self.assertContains(response, f'id="task-manage-{self.task.id}"')
+        self.assertNotContains(response, 'id="task-status-template"')
+
+    def test_only_host_deltas_carry_suggestions(self):
+        Task.objects.create(event=self.event, description="Take more photos")
+        consumer = TaskBoardConsumer()
+        consumer.event_id = self.event.id
+        consumer.send = mock.AsyncMock()
+        for user, suggestions in [(self.host, {"Take more photos": "vol"}), (self.volunteer.user, None)]:
+            consumer.user = user
+            self.assertTrue(async_to_sync(consumer.is_member)())
+            async_to_sync(consumer.task_delta)({'action': 'updated', 'task': {'id': self.task.id}})
+            message = json.loads(consumer.send.call_args.kwargs['text_data'])
+            self.assertEqual(message.get('suggestions'), suggestions)
+
+class UserInteractionMatrixTests(TestCase):
+    def test_three_sources_counted_once(self):
+        a, b, outsider = (User.objects.create(username=name) for name in ["a", "b", "outsider"])
+        events = [
+            Event.objects.create(title=f"Event {i}", description="", date=at(10), event_type=event_type,
+                                 status=status, proposed_by=proposer)
+            for i, (event_type, status, proposer) in enumerate([
+                ('music', 'approved', a), ('sports', 'pending', a), ('program', 'approved', None),
+                ('other', 'approved', None), ('music', 'approved', outsider),
+            ])
+        ]
+        for user, event in [(a, 0), (a, 2), (b, 4)]:
+            EventView.objects.create(user=user, event=events[event])
+        for user, event, status in [(a, 0, 'going'), (b, 3, 'going'), (a, 3, 'interested')]:
+            EventParticipation.objects.create(user=user, event=events[event], status=status)
+
+        matrix, event_ids, event_types = user_interaction_matrix([a.id, b.id])
+        columns = {event_id: i for i, event_id in enumerate(event_ids.tolist())}
+        self.assertEqual({event_types[columns[event.id]] for event in events if event.id in columns}, {'music', 'program', 'other'})
+        self.assertNotIn(events[1].id, columns)  # Only approved proposals count
+        interactions = {
+            (user, event.id) for user, row in [("a", 0), ("b", 1)] for event in events
+            if event.id in columns and matrix[row, columns[event.id]]
+        }
+        self.assertEqual(interactions, {("a", events[0].id), ("a", events[2].id), ("b", events[3].id), ("b", events[4].id)})
+        self.assertEqual(matrix.data.tolist(), [1.0] * 4)
+
+class CollaborativeRecommendationsCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        recommendation_store.clear_local()
+        upcoming = timezone.now() + timedelta(days=1)
+        self.events = [Event.objects.create(title=f"Event {i}", description="", date=upcoming, status='approved') for i in range(4)]
+        self.users = [User.objects.create(username=name) for name in ["a", "b", "c", "d"]]
+        a, b, c, _ = self.users
+        for user, event, score in [(a, 0, 5), (a, 1, 5), (b, 0, 5), (b, 1, 4), (b, 2, 5), (c, 3, 2)]:
+            Rating.objects.create(user=user, event=self.events[event], score=score)
+
+    def published(self, **options):
+        recommendation_store.publish('collaborative', {})
+        with redirect_stdout(io.StringIO()) as output:
+            call_command('compute_collaborative_recommendations', stdout=output, **options)
+        recommendation_store.clear_local()
+        return [recommendation_store.get(user.id) for user in self.users], output.getvalue()
+
+    def test_publishes_highly_rated_events_of_similar_users(self):
+        expected = [[self.events[2].id], [], [], []]
+        with tempfile.TemporaryDirectory() as directory:
+            for options in [{}, {'workers': 2}, {'ann': True}, {'ann': True, 'workers': 2}]:
+                options['index_path'] = os.path.join(directory, 'index.npz')
+                self.assertEqual(self.published(**options)[0], expected, options)
+
+    def test_benchmark_recall_publishes_nothing(self):
+        published, output = self.published(benchmark_recall=True)
+        self.assertEqual(published, [[], [], [], []])
+        self.assertEqual(json.loads(output)['users'], 4)
+
+class TopKIndicesTests(SimpleTestCase):
+    def test_best_first(self):
+        scores = np.array([[0.2, 0.9, 0.5, 0.8], [1.0, 0.0, 3.0, 2.0]])
+        np.testing.assert_array_equal(top_k_indices(scores, 3), [[1, 3, 2], [2, 3, 0]])
+
+    def test_non_positive_scores_are_padded(self):
+        scores = np.array([[0.0, -1.0, 0.5], [0.0, 0.0, 0.0]])
+        np.testing.assert_array_equal(top_k_indices(scores, 2), [[2, -1], [-1, -1]])
+
+    def test_k_beyond_the_columns(self):
+        self.assertEqual(top_k_indices(np.array([[1.0, 2.0]]), 5).tolist(), [[1, 0]])
+        self.assertEqual(top_k_indices(np.array([[1.0, 2.0]]), 0).shape, (1, 0))
+        self.assertEqual(top_k_indices(np.zeros((3, 0)), 2).shape, (3, 0))
+        self.assertEqual(top_k_indices(np.zeros((0, 4)), 2).shape, (0, 2))
+
+class UserSimilarityIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        ratings = (rng.random((40, 12)) > 0.6) * rng.integers(1, 6, (40, 12))
+        ratings[5] = 0  # Users without ratings are left out
+        self.ratings = csr_matrix(ratings.astype(np.float32))
+        self.user_ids = np.arange(100, 140)
+        self.index = UserSimilarityIndex.build(self.user_ids, np.arange(12), self.ratings, n_tables=4, n_bits=3)
+
+    def test_neighbours_exclude_the_user_and_are_best_first(self):
+        vectors = unit_rows(self.ratings[:3])
+        neighbours, similarities = self.index.query(vectors, 5, exclude_users=self.user_ids[:3])
+        self.assertNotIn(105, self.index.user_ids)
+        for row in range(3):
+            self.assertNotIn(self.user_ids[row], neighbours[row])
+            self.assertTrue(np.all(np.diff(similarities[row]) <= 0))
+            found = neighbours[row] >= 0
+            exact = (self.index.vectors[self.index.user_idx[self.user_ids[row]]] @ self.index.vectors.T).toarray().ravel()
+            expected = exact[[self.index.user_idx[user_id] for user_id in neighbours[row][found]]]
+            np.testing.assert_allclose(similarities[row][found], expected, rtol=1e-5)
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.npz')
+            self.index.save(path)
+            self.assertEqual(os.listdir(directory), ['index.npz'])
+            loaded = UserSimilarityIndex.load(path)
+        np.testing.assert_array_equal(loaded.user_ids, self.index.user_ids)
+        np.testing.assert_array_equal(loaded.planes, self.index.planes)
+        self.assertEqual((loaded.vectors != self.index.vectors).nnz, 0)
+        vectors = unit_rows(self.ratings[:10])
+        for expected, actual in zip(self.index.query(vectors, 4), loaded.query(vectors, 4)):
+            np.testing.assert_array_equal(actual, expected)
+
+class RecommendationStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = RecommendationStore(sources=('first', 'second', 'third'), local_ttl=60)
+
+    def test_publish_swaps_versions(self):
+        self.assertEqual(self.store.get(1), [])
+        first = self.store.publish('first', {1: [10, 11], 2: [12]})
+        self.assertEqual((self.store.get(1), self.store.get(2)), ([10, 11], [12]))
+
+        other_process = RecommendationStore(sources=('first', 'second', 'third'), local_ttl=60)
+        self.assertEqual(other_process.get(1), [10, 11])
+        second = self.store.publish('first', {2: [13]})
+        self.assertGreater(second, first)
+        self.assertEqual((self.store.get(1), self.store.get(2)), ([], [13]))
+        # Other processes keep their pointers and lookups until the local copy expires
+        self.assertEqual(other_process.get(1), [10, 11])
+        other_process.clear_local()
+        self.assertEqual(other_process.get(1), [])
+
+    def test_batches_go_by_source_priority(self):
+        self.store.publish('first', {1: [10], 2: []})
+        self.store.publish('second', {1: [20], 2: [21]})
+        self.assertEqual((self.store.get(1), self.store.get(2)), ([10], [21]))
+
+    def test_newer_user_lists_outrank_older_lists_above_them(self):
+        self.store.publish('second', {1: [20]})
+        self.store.publish('first', {1: [10]})
+        self.store.set_user('second', 1, [21])
+        self.assertEqual(self.store.get(1), [21])
+        self.store.set_user('first', 1, [11])
+        self.assertEqual(self.store.get(1), [11])
+        # Lists computed together go by source priority
+        self.store.set_user('second', 1, [22], updated_at=1e12)
+        self.store.set_user('first', 1, [12], updated_at=1e12)
+        self.assertEqual(self.store.get(1), [12])
+
+    def test_user_lists_stay_behind_newer_batches_above_them(self):
+        self.store.publish('first', {1: [10]})
+        self.store.publish('third', {})
+        self.store.set_user('third', 1, [30])
+        self.assertEqual(self.store.get(1), [30])
+        self.store.publish('second', {1: [20]})
+        self.assertEqual(self.store.get(1), [10])
+
+    def test_set_user_waits_for_a_published_version(self):
+        self.store.set_user('first', 1, [10])
+        self.assertEqual(self.store.get(1), [])
+        self.store.publish('first', {})
+        self.store.set_user('first', 1, [10])
+        self.assertEqual(self.store.get(1), [10])
+
+class ItemSimilarityModelTests(SimpleTestCase):
+    def setUp(self):
+        self.event_ids = np.array([30, 10, 20, 40])
+        feedback = csr_matrix(np.array([
+            [0, 2, 1, 0],
+            [0, 1, 1, 3],
+            [1, 0, 0, 1],
+            [1, 0, 1, 0],
+        ], dtype=np.float32))
+        # 40 has already started, so it can have neighbours but never be one
+        dates = np.array([at(5).timestamp(), at(5).timestamp(), at(5).timestamp(), at(-5).timestamp()])
+        servable = np.array([True, True, True, True])
+        self.model = ItemSimilarityModel.build(feedback, self.event_ids, dates, servable, k=2, now=at(0))
+
+    def test_neighbours_skip_the_event_itself_and_past_events(self):
+        table = self.model.table
+        self.assertEqual(table['event_id'].tolist(), [10, 20, 30, 40])
+        self.assertEqual(table['neighbours'][0].tolist(), [20, -1])  # No one interacted with both 10 and 30
+        self.assertEqual(table['neighbours'][3].tolist(), [20, 10])
+        self.assertNotIn(40, table['neighbours'])
+        for row in table:
+            self.assertNotIn(row['event_id'], row['neighbours'])
+        self.assertEqual(self.model.recommend([40], [1.0], exclude=[20], now=at(0)), [10])
+        self.assertEqual(self.model.recommend([99], [1.0], now=at(0)), [])
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'items.npy')
+            self.model.save(path)
+            self.assertEqual(os.listdir(directory), ['items.npy'])
+            loaded = ItemSimilarityModel.load(path)
+            self.assertIsInstance(loaded.table, np.memmap)
+            np.testing.assert_array_equal(loaded.table, self.model.table)
+            self.assertEqual(loaded.recommend([40, 10], [2.0, 1.0], now=at(0)), self.model.recommend([40, 10], [2.0, 1.0], now=at(0)))
+            del loaded
+
+class ImplicitALSModelTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.feedback = csr_matrix(((rng.random((20, 8)) > 0.6) * rng.integers(1, 4, (20, 8))).astype(np.float32))
+        dates = np.array([at(5 if i != 6 else -5).timestamp() for i in range(8)])
+        servable = np.arange(8) != 7
+        self.model = ImplicitALSModel.train(self.feedback, np.arange(100, 120), np.arange(8) * 10, dates, servable,
+                                            factors=4, iterations=3)
+
+    def test_recommends_only_unseen_servable_events(self):
+        for row, user_id in enumerate(range(100, 120)):
+            recommended = self.model.recommend(user_id, k=8, now=at(0))
+            # 60 has started and 70 is not approved
+            unseen = {0, 10, 20, 30, 40, 50} - set((self.feedback[row].indices * 10).tolist())
+            self.assertEqual(set(recommended), unseen)
+        self.assertEqual(self.model.recommend(999), [])
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'als.npz')
+            self.model.save(path)
+            self.assertEqual(os.listdir(directory), ['als.npz'])
+            loaded = ImplicitALSModel.load(path)
+        for name in ['user_ids', 'event_ids', 'user_factors', 'event_factors', 'event_dates', 'servable', 'seen_indptr', 'seen_indices']:
+            np.testing.assert_array_equal(getattr(loaded, name), getattr(self.model, name), name)
+        for user_id in range(100, 120):
+            self.assertEqual(loaded.recommend(user_id, now=at(0)), self.model.recommend(user_id, now=at(0)))
+
+class ShardingTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.user_matrix = rng.random((37, 4))
+        self.event_matrix = np.eye(4)[rng.integers(0, 4, 9)]
+        self.excluded = csr_matrix((rng.random((37, 9)) > 0.8).astype(float))
+        self.arrays = {'user_matrix': self.user_matrix, 'event_matrix': self.event_matrix, **csr_parts('excluded', self.excluded)}
+
+    def test_sharded_matches_serial(self):
+        serial = score_users(self.user_matrix, self.event_matrix, self.excluded, 0, 37)
+        shards = run_sharded(_score_shard, 37, 2, self.arrays)
+        self.assertGreater(len(shards), 1)
+        np.testing.assert_array_equal(np.vstack(shards), serial)
+
+    def test_falls_back_to_one_process_without_fork(self):
+        serial = score_users(self.user_matrix, self.event_matrix, self.excluded, 0, 37)
+        with mock.patch('events.sharding.get_all_start_methods', return_value=['spawn']), self.assertLogs('events.sharding', 'WARNING'):
+            shards = run_sharded(_score_shard, 37, 2, self.arrays)
+        self.assertEqual(len(shards), 1)
+        np.testing.assert_array_equal(shards[0], serial)
+        self.assertEqual(shared_arrays(), {})
+
+    def test_no_active_users(self):
+        Event.objects.create(title="Event", description="", date=timezone.now() + timedelta(days=1), status='approved')
+        User.objects.update(is_active=False)
+        self.assertEqual(run_sharded(_score_shard, 0, 2, self.arrays), [])
+        with redirect_stdout(io.StringIO()):
+            call_command('compute_recommendations', workers=2)
+
+class RecommendationUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        recommendation_store.clear_local()
+        self.user = User.objects.create(username="viewer")
+        upcoming = timezone.now() + timedelta(days=1)
+        self.sports, self.music = [
+            [Event.objects.create(title=f"{kind} {i}", description="", date=upcoming, status='approved',
+                                  event_type=kind, image='event_images/x.jpg') for i in range(2)]
+            for kind in ['sports', 'music']
+        ]
+
+    def test_viewing_an_event_refreshes_the_home_page(self):
+        recommendation_store.publish('collaborative', {self.user.id: [event.id for event in self.sports]})
+        recommendation_store.publish('content', {})
+        with mock.patch.object(recommendation_update_queue, 'deferred', False), \
+                self.captureOnCommitCallbacks(execute=True):
+            EventView.objects.create(event=self.music[0], user=self.user)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(list(response.context['recommended_events']), [self.music[1]])
+
+    def test_home_keeps_the_recommenders_ranking(self):
+        ranked = [self.music[1], self.sports[0], self.music[0]]
+        self.sports[0].date += timedelta(days=1)
+        self.sports[0].save()
+        recommendation_store.publish('als', {self.user.id: [event.id for event in ranked]})
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(list(response.context['recommended_events']), ranked)
+
+    def test_als_recommendations_are_published_to_the_store(self):
+        others = [User.objects.create(username=f"fan {i}") for i in range(3)]
+        for user in others:
+            for event in self.music:
+                EventParticipation.objects.create(user=user, event=event, status='going')
+        EventView.objects.create(user=self.user, event=self.music[0])
+        EventView.objects.create(user=others[0], event=self.sports[0])
+        with tempfile.TemporaryDirectory() as directory, redirect_stdout(io.StringIO()):
+            path = os.path.join(directory, 'als.npz')
+            call_command('train_als_recommender', path=path, factors=4, iterations=3)
+            model = ImplicitALSModel.load(path)
+        self.assertTrue(model.recommend(self.user.id))
+        self.assertEqual(recommendation_store.get(self.user.id), model.recommend(self.user.id))
+
+    def test_stale_stored_lists_fall_through_to_item_neighbours(self):
+        started = Event.objects.create(title="started", description="", date=timezone.now() - timedelta(hours=1),
+                                       status='approved', image='event_images/x.jpg')
+        recommendation_store.publish('als', {self.user.id: [started.id, self.sports[0].id]})
+        self.sports[0].status = 'rejected'
+        self.sports[0].save()
+        self.client.force_login(self.user)
+        with mock.patch('events.views.item_recommendations', return_value=[self.music[0].id]):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(list(response.context['recommended_events']), [self.music[0]])
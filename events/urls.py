@@ -19,6 +19,9 @@ urlpatterns = [
     path('manage-volunteers/<int:volunteer_id>/', views.manage_volunteers, name='manage_volunteers'),   
     path('chat/', views.chat_dashboard, name='chat_dashboard'),
     path('todo/<int:event_id>/', views.todo_view, name='todo'),
+    path('todo/<int:event_id>/tasks/bulk/', views.bulk_tasks, name='bulk_tasks'),
+    path('venues/free-slots/', views.venue_free_slots, name='venue_free_slots'),
+    path('event/nearby/', views.nearby_events, name='nearby_events'),
 
 ]
  
\ No newline at end of file
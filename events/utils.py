@@ -1,19 +1,47 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from datetime import timedelta
+from django.db.models import Count
+from django.db import models, transaction, connection, connections, close_old_connections, IntegrityError
+from datetime import datetime, time, timedelta
 from django.conf import settings
-
-from .models import Venue, VenueBooking, Event, EventParticipation, Task
+from django.core.cache import cache
+from bisect import bisect_left, insort
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+import threading
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .models import Venue, VenueBooking, VenueUtilization, Event, EventParticipation, Volunteer, Task
 from math import radians, sin, cos, sqrt, atan2
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse.csgraph import minimum_spanning_tree
+from sklearn.feature_extraction.text import TfidfVectorizer
+import numpy as np
 
 # ACEM College coordinates
 COLLEGE_LATITUDE = 27.6887106
 COLLEGE_LONGITUDE = 85.2897808
 
-DEFAULT_EVENT_DURATION = getattr(settings, 'DEFAULT_EVENT_DURATION', 4)  # Hours
+BATCH_ALLOCATION_ATTEMPTS = 3
+VENUE_TABLE_VERSION_KEY = 'venue_table_version'
+VENUE_ALLOCATION_DEFERRED = getattr(settings, 'VENUE_ALLOCATION_DEFERRED', True)
+VENUE_ALLOCATION_WORKERS = getattr(settings, 'VENUE_ALLOCATION_WORKERS', 2)
+FREE_SLOTS_CAPACITY_BUCKET = 50
+# Bumped when a venue changes, which stales every cached day at once
+FREE_SLOTS_VENUES_VERSION_KEY = 'free_slots_venues_version'
+# Relative weights in the task assignment cost: one open task = 1
+TASK_WORKLOAD_WEIGHT = 1.0
+TASK_COMMUNICATION_WEIGHT = 0.5
+TASK_MATCH_WEIGHT = 2.0
+VOLUNTEER_VECTORS_TIMEOUT = 60 * 60 * 24
+TASK_SUGGESTIONS_TIMEOUT = 60 * 60 * 24
+FREE_SLOTS_CACHE_TIMEOUT = 60 * 60
+logger = logging.getLogger(__name__)
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two points using the Haversine formula (in km)."""
@@ -25,107 +53,376 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     c = 2 * atan2(sqrt(a), sqrt(1-a))
     return R * c
 
-def allocate_venue(event):
-    start_time = event.date
-    end_time = event.end_date or event.date + timedelta(hours=DEFAULT_EVENT_DURATION)
+def bump_cache_version(key):
+    """Increment a version counter in the shared cache, so keys built from it go stale."""
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key)
 
-    # Validate or handle manual venue assignment
-    if event.venue and event.venue.capacity < event.expected_attendees:
-        event.venue = None
-        event.save(update_fields=['venue'])
+class CoalescingQueue:
+    """
+    Runs handler(key) outside the request path once the current transaction commits, on a small
+    thread pool (or inline when deferred is False). A key that is already waiting is not queued
+    again, and discard() lets a caller doing the work synchronously take a waiting key over.
+    """
+    def __init__(self, handler, name, deferred=True, workers=1):
+        self.handler = handler
+        self.name = name
+        self.deferred = deferred
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+    def request(self, key):
+        transaction.on_commit(partial(self._queue, key))
+
+    def discard(self, key):
+        with self._lock:
+            self._pending.discard(key)
+
+    def _queue(self, key):
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        if self.deferred:
+            self._executor.submit(self._run, key)
+        else:
+            self._run(key)
+
+    def _run(self, key):
+        with self._lock:
+            if key not in self._pending:
+                return  # Already handled synchronously
+            self._pending.discard(key)
+
+        close_old_connections()
+        try:
+            self.handler(key)
+        except Exception:
+            logger.exception("Deferred %s failed for %s", self.name, key)
+        finally:
+            if self.deferred:
+                # Worker threads own their connections; don't leave them open between jobs
+                connections.close_all()
+
+def haversine_distances(lat, lon, latitudes, longitudes):
+    """Vectorized Haversine distance (in km) from one point to arrays of points."""
+    R = 6371  # Earth's radius in km
+    lat, lon = np.radians(lat), np.radians(lon)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((latitudes - lat) / 2) ** 2 + np.cos(lat) * np.cos(latitudes) * np.sin((longitudes - lon) / 2) ** 2
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
 
-    with transaction.atomic():  
-        VenueBooking.objects.filter(event=event).delete()
+class VenueDistanceTable:
+    """
+    Venue ids, capacities and distances from the college as NumPy arrays,
+    so every candidate venue is scored in one vectorized expression.
+    Only venues with coordinates are included, as allocation skips the rest.
+    """
+    def __init__(self, venues, version=0):
+        venues = [(venue_id, capacity, lat, lon) for venue_id, capacity, lat, lon in venues if lat and lon]
+        self.version = version
+        self.venue_ids = np.array([venue[0] for venue in venues], dtype=np.int64)
+        self.capacities = np.array([venue[1] for venue in venues], dtype=float)
+        self.latitudes = np.array([venue[2] for venue in venues], dtype=float)
+        self.longitudes = np.array([venue[3] for venue in venues], dtype=float)
+        self.distances = haversine_distances(COLLEGE_LATITUDE, COLLEGE_LONGITUDE, self.latitudes, self.longitudes)
+
+    @classmethod
+    def load(cls, version=0):
+        # Capacity order keeps the old tie-break between equally scored venues
+        return cls(Venue.objects.order_by('capacity', 'id').values_list('id', 'capacity', 'latitude', 'longitude'), version)
+
+    def free_mask(self, availability, start, end):
+        return np.fromiter((availability.is_free(venue_id, start, end) for venue_id in self.venue_ids.tolist()),
+                           dtype=bool, count=len(self.venue_ids))
+
+    def scores(self, expected_attendees, mask=None):
+        """Capacity penalty + 5 x distance per venue; inf where the venue is too small or masked out."""
+        capacity_diff = self.capacities - expected_attendees
+        scores = np.where(capacity_diff > 0, capacity_diff ** 2, 0) + self.distances * 5
+        scores[capacity_diff < 0] = np.inf
+        if mask is not None:
+            scores[~mask] = np.inf
+        return scores
+
+    def rank(self, expected_attendees, mask=None):
+        """Venue ids of usable venues, best score first."""
+        scores = self.scores(expected_attendees, mask)
+        order = np.argsort(scores, kind='stable')
+        return self.venue_ids[order[np.isfinite(scores[order])]].tolist()
+
+_venue_table = None
+
+def get_venue_table():
+    # The version lives in the shared cache so every worker drops its table when a venue changes
+    global _venue_table
+    version = cache.get(VENUE_TABLE_VERSION_KEY, 0)
+    if _venue_table is None or _venue_table.version != version:
+        _venue_table = VenueDistanceTable.load(version)
+    return _venue_table
+
+# Registered after parse_venue_coordinates, so parsed coordinates are already stored
+@receiver(post_save, sender=Venue)
+@receiver(post_delete, sender=Venue)
+def invalidate_venue_table(sender, instance, **kwargs):
+    global _venue_table
+    _venue_table = None
+    bump_cache_version(VENUE_TABLE_VERSION_KEY)
+
+class VenueAvailabilityIndex:
+    """
+    Per-venue sorted booking intervals, loaded from VenueBooking in one query.
+    Answers "which venues are free in [start, end)" without a query per venue.
+    """
+    def __init__(self, bookings=()):
+        self._intervals = defaultdict(list)
+        for venue_id, start, end in bookings:
+            self._intervals[venue_id].append((start, end))
+        self._starts = {}
+        self._max_ends = {}
+        for venue_id in self._intervals:
+            self._reindex(venue_id)
+
+    @classmethod
+    def build(cls, start=None, end=None, exclude_events=()):
+        # Only bookings touching the [start, end) window can ever conflict
+        bookings = VenueBooking.objects.all()
+        if start is not None:
+            bookings = bookings.filter(end_time__gt=start)
+        if end is not None:
+            bookings = bookings.filter(start_time__lt=end)
+        if exclude_events:
+            bookings = bookings.exclude(event__in=exclude_events)
+        return cls(bookings.values_list('venue_id', 'start_time', 'end_time'))
+
+    def _reindex(self, venue_id):
+        intervals = self._intervals[venue_id]
+        intervals.sort()
+        self._starts[venue_id] = [s for s, _ in intervals]
+        # Running max of end times, so one bisect answers the overlap question
+        max_ends = []
+        current = None
+        for _, e in intervals:
+            current = e if current is None or e > current else current
+            max_ends.append(current)
+        self._max_ends[venue_id] = max_ends
+
+    def add(self, venue_id, start, end):
+        insort(self._intervals[venue_id], (start, end))
+        self._reindex(venue_id)
+
+    def is_free(self, venue_id, start, end):
+        starts = self._starts.get(venue_id)
+        if not starts:
+            return True
+        # Bookings starting before `end` overlap unless they all end by `start`
+        i = bisect_left(starts, end)
+        return i == 0 or self._max_ends[venue_id][i - 1] <= start
 
-        # Check if current venue should be reconsidered due to overcapacity
-        reconsider_venue = False
-        if event.venue:
-            capacity_diff = event.venue.capacity - event.expected_attendees
-            overcapacity_threshold = event.expected_attendees * 0.2  # 20% overcapacity as threshold
-            if capacity_diff > overcapacity_threshold and capacity_diff > 10:  # Minimum 10 attendees difference
-                reconsider_venue = True
-
-        if event.venue and not reconsider_venue:
-            conflicts = VenueBooking.objects.filter(
-                venue=event.venue,
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            ).exclude(event=event)  
-            if not conflicts.exists():
-                VenueBooking.objects.update_or_create(
-                    event=event,
-                    defaults={'venue': event.venue, 'start_time': start_time, 'end_time': end_time}
-                )
-                return True
-
-        suitable_venues = Venue.objects.filter(
-            capacity__gte=event.expected_attendees
-        ).order_by('capacity')  
-
-        best_venue = None
-        best_score = float('inf')
-
-        for venue in suitable_venues:
-            conflicts = VenueBooking.objects.filter(
+    def free_venues(self, venue_ids, start, end):
+        return [venue_id for venue_id in venue_ids if self.is_free(venue_id, start, end)]
+
+def get_booking_window(event):
+    return event.booking_window()
+
+def should_reconsider_venue(venue, expected_attendees):
+    # Check if current venue should be reconsidered due to overcapacity
+    capacity_diff = venue.capacity - expected_attendees
+    overcapacity_threshold = expected_attendees * 0.2  # 20% overcapacity as threshold
+    return capacity_diff > overcapacity_threshold and capacity_diff > 10  # Minimum 10 attendees difference
+
+def book_venue(event, venue):
+    """
+    Book `venue` for `event`, raising IntegrityError if it overlaps another booking.
+    On PostgreSQL the venuebooking_no_overlap exclusion constraint rejects the
+    insert; other databases (SQLite for local runs) check for overlaps first.
+    """
+    # Savepoint, so a rejected insert leaves the caller's transaction usable
+    with transaction.atomic():
+        # Same times VenueBooking.save stores
+        start_time, end_time = get_booking_window(event)
+        if connection.vendor != 'postgresql':
+            overlapping = VenueBooking.objects.filter(
                 venue=venue,
                 start_time__lt=end_time,
                 end_time__gt=start_time
             ).exclude(event=event)
-            if conflicts.exists() or not venue.latitude or not venue.longitude:
-                continue
+            if overlapping.exists():
+                raise IntegrityError(f"{venue} is already booked between {start_time} and {end_time}.")
+        return VenueBooking.objects.create(event=event, venue=venue, start_time=start_time, end_time=end_time)
+
+def _set_event_venue(event, venue):
+    # Queryset update, so post_save does not fire and re-queue an allocation
+    event.venue = venue
+    Event.objects.filter(pk=event.pk).update(venue=venue)
 
-            distance = calculate_distance(COLLEGE_LATITUDE, COLLEGE_LONGITUDE, venue.latitude, venue.longitude)
-
-            capacity_diff = venue.capacity - event.expected_attendees
-            # Penalize overcapacity more heavily (e.g., quadratic penalty)
-            capacity_penalty = capacity_diff ** 2 if capacity_diff > 0 else 0
-            score = capacity_penalty + (distance * 5)  # Prioritize minimizing overcapacity and distance
-
-            if score < best_score:
-                best_score = score
-                best_venue = venue
-
-        if best_venue:
-            # Update or create booking
-            VenueBooking.objects.update_or_create(
-                event=event,
-                defaults={'venue': best_venue, 'start_time': start_time, 'end_time': end_time}
-            )
-            event.venue = best_venue
-            event.save(update_fields=['venue'])
+def allocate_venue(event):
+    # A synchronous allocation supersedes any deferred one still waiting for this event
+    venue_allocation_queue.discard(event.pk)
+
+    start_time, end_time = get_booking_window(event)
+
+    # Validate or handle manual venue assignment
+    if event.venue and event.venue.capacity < event.expected_attendees:
+        _set_event_venue(event, None)
+
+    with transaction.atomic():  
+        # Row lock serializes a request-path allocation with a deferred one for the same event
+        list(Event.objects.select_for_update().filter(pk=event.pk).values_list('pk', flat=True))
+        VenueBooking.objects.filter(event=event).delete()
+        availability = VenueAvailabilityIndex.build(start_time, end_time, exclude_events=[event])
+
+        if event.venue and not should_reconsider_venue(event.venue, event.expected_attendees):
+            if availability.is_free(event.venue_id, start_time, end_time):
+                try:
+                    book_venue(event, event.venue)
+                    return True
+                except IntegrityError:
+                    pass
+
+        table = get_venue_table()
+        ranked_ids = table.rank(event.expected_attendees, table.free_mask(availability, start_time, end_time))
+        venues = Venue.objects.in_bulk(ranked_ids)
+
+        for venue_id in ranked_ids:
+            venue = venues.get(venue_id)
+            if venue is None:
+                continue
+            try:
+                book_venue(event, venue)
+            except IntegrityError:
+                # Booked by a concurrent allocation since the index was loaded
+                continue
+            _set_event_venue(event, venue)
             return True
 
         # No suitable venue; clear event.venue
         if event.venue:
-            event.venue = None
-            event.save(update_fields=['venue'])
+            _set_event_venue(event, None)
         return False
 
-# to store previous values in temproray attribute
-# to detect changes in post save
-@receiver(pre_save, sender=Event)
-def store_previous_state(sender, instance, **kwargs):
+def _allocate_venue_by_id(event_id):
+    event = Event.objects.select_related('venue').filter(pk=event_id).first()
+    if event:
+        allocate_venue(event)
+
+venue_allocation_queue = CoalescingQueue(
+    _allocate_venue_by_id, 'venue-allocation', deferred=VENUE_ALLOCATION_DEFERRED, workers=VENUE_ALLOCATION_WORKERS,
+)
+
+def request_venue_allocation(event):
+    """
+    Allocate a venue for `event` outside the request path, once the current
+    transaction commits. Requests for an event that is already waiting are
+    coalesced into the pending one.
+    """
+    venue_allocation_queue.request(event.pk)
+
+def _overlapping_groups(events, windows):
+    # Sweep by start time; events whose windows chain-overlap compete for the same venues
+    group, group_end = [], None
+    for event in sorted(events, key=lambda e: windows[e.id][0]):
+        start, end = windows[event.id]
+        if group and start >= group_end:
+            yield group
+            group, group_end = [], None
+        group.append(event)
+        group_end = end if group_end is None or end > group_end else group_end
+    if group:
+        yield group
+
+def allocate_venues(events):
+    """
+    Allocate venues for a set of approved events in one go.
+    Overlapping events are matched to venues together (min-cost assignment over
+    the same capacity + distance score as allocate_venue), then all bookings are
+    written in a single transaction. Returns {event_id: allocated}.
+    """
+    events = list(events)
+    if not events:
+        return {}
 
-    if instance.pk:
+    windows = {event.id: get_booking_window(event) for event in events}
+    for attempt in range(BATCH_ALLOCATION_ATTEMPTS):
+        assignment = _plan_venue_assignment(events, windows)
         try:
-            previous = Event.objects.get(pk=instance.pk)
-            instance._previous_attendees = previous.expected_attendees
-            instance._previous_date = previous.date
-            instance._previous_end_date = previous.end_date
-            instance._previous_status = previous.status
-            instance._previous_venue = previous.venue
-        except Event.DoesNotExist:
-            instance._previous_attendees = None
-            instance._previous_date = None
-            instance._previous_end_date = None
-            instance._previous_status = None
-            instance._previous_venue = None
-    else:
-        instance._previous_attendees = None
-        instance._previous_date = None
-        instance._previous_end_date = None
-        instance._previous_status = None
-        instance._previous_venue = None
+            with transaction.atomic():
+                VenueBooking.objects.filter(event__in=events).delete()
+                # bulk_create skips VenueBooking.save, so mirror the times it would store
+                VenueBooking.objects.bulk_create([
+                    VenueBooking(event=event, venue_id=assignment[event.id],
+                                 start_time=windows[event.id][0], end_time=windows[event.id][1])
+                    for event in events if event.id in assignment
+                ])
+                for event in events:
+                    event.venue_id = assignment.get(event.id)
+                # bulk_update skips post_save, so no per-event reallocation is triggered
+                Event.objects.bulk_update(events, ['venue'])
+                # Nor does bulk_create, so do the booking receivers' work here
+                transaction.on_commit(partial(_bookings_created, [
+                    (assignment[event.id], *windows[event.id])
+                    for event in events if event.id in assignment
+                ]))
+            break
+        except IntegrityError:
+            # A concurrent approval took a planned venue; replan against fresh bookings
+            if attempt == BATCH_ALLOCATION_ATTEMPTS - 1:
+                raise
+
+    return {event.id: event.id in assignment for event in events}
+
+def _plan_venue_assignment(events, windows):
+    availability = VenueAvailabilityIndex.build(
+        min(start for start, _ in windows.values()),
+        max(end for _, end in windows.values()),
+        exclude_events=events,
+    )
+    table = get_venue_table()
+    venues = Venue.objects.in_bulk({event.venue_id for event in events if event.venue_id})
+
+    assignment = {}
+
+    def book(event, venue_id):
+        assignment[event.id] = venue_id
+        availability.add(venue_id, *windows[event.id])
+
+    # Keep manual venue assignments that still fit, as allocate_venue does
+    unplaced = []
+    for event in events:
+        venue = venues.get(event.venue_id)
+        if (venue and venue.capacity >= event.expected_attendees
+                and not should_reconsider_venue(venue, event.expected_attendees)
+                and availability.is_free(venue.id, *windows[event.id])):
+            book(event, venue.id)
+        else:
+            unplaced.append(event)
+
+    for group in _overlapping_groups(unplaced, windows):
+        costs = np.vstack([
+            table.scores(event.expected_attendees, table.free_mask(availability, *windows[event.id]))
+            for event in group
+        ])
+
+        feasible = np.isfinite(costs)
+        if feasible.any():
+            # Infeasible pairs cost more than any all-feasible matching, so the
+            # solver places as many events as possible before minimising score
+            blocked = costs[feasible].max() * len(group) + 1
+            rows, cols = linear_sum_assignment(np.where(feasible, costs, blocked))
+            for row, col in zip(rows, cols):
+                if feasible[row, col]:
+                    book(group[row], int(table.venue_ids[col]))
+
+        # Events left over may still fit around bookings of non-overlapping group members
+        for event in group:
+            if event.id in assignment:
+                continue
+            ranked_ids = table.rank(event.expected_attendees, table.free_mask(availability, *windows[event.id]))
+            if ranked_ids:
+                book(event, ranked_ids[0])
+
+    return assignment
 
 # to allocate automactically if superuser create event
 # to detect changes and allocate venue accordingly
@@ -142,87 +439,417 @@ def allocate_venue_on_approval_or_update(sender, instance, created, **kwargs):
         if not instance.status:
             instance.status = 'approved'  # Match EVENT_STATUS choices
             instance.save(update_fields=['status'])
-        allocate_venue(instance)
+        request_venue_allocation(instance)
         return
 
     # Check for approval change or relevant field changes
-    fields_changed = (
-        instance._previous_attendees != instance.expected_attendees or
-        instance._previous_date != instance.date or
-        instance._previous_end_date != instance.end_date or
-        instance._previous_venue != instance.venue
-    )
+    changed = instance.changed_fields()
+    fields_changed = bool(changed.keys() & {'expected_attendees', 'date', 'end_date', 'venue_id'})
     approval_changed = (
-        instance._previous_status == 'pending' and instance.status == 'approved'
+        changed.get('status') == 'pending' and instance.status == 'approved'
     )
 
     if instance.status == 'approved' and (created or approval_changed or fields_changed):
-        allocate_venue(instance)
-
-# Union-Find for Kruskal's MST
-class UnionFind:
-    def __init__(self, size):
-        self.parent = list(range(size))
-        self.rank = [0] * size
-
-    def find(self, x):
-        if self.parent[x] != x:
-            self.parent[x] = self.find(self.parent[x])
-        return self.parent[x]
-
-    def union(self, x, y):
-        px, py = self.find(x), self.find(y)
-        if px == py:
-            return
-        if self.rank[px] < self.rank[py]:
-            px, py = py, px
-        self.parent[py] = px
-        if self.rank[px] == self.rank[py]:
-            self.rank[px] += 1
+        request_venue_allocation(instance)
+
+def find_nearby_events(latitude, longitude, radius_km, start_time, end_time, limit=50):
+    """
+    Approved events between start_time and end_time at venues within radius_km,
+    nearest first, as (event, distance_km) pairs. An indexed bounding box on the
+    venue coordinates narrows the venues before the exact Haversine distances.
+    """
+    lat_delta = radius_km / 111.32  # km per degree of latitude
+    lon_delta = radius_km / (111.32 * max(cos(radians(latitude)), 1e-6))
+    candidates = list(Venue.objects.filter(
+        latitude__range=(latitude - lat_delta, latitude + lat_delta),
+        longitude__range=(longitude - lon_delta, longitude + lon_delta),
+    ).values_list('id', 'latitude', 'longitude'))
+    if not candidates:
+        return []
+
+    venue_ids, latitudes, longitudes = (np.array(column) for column in zip(*candidates))
+    distances = haversine_distances(latitude, longitude, latitudes, longitudes)
+    within = distances <= radius_km
+    venue_distances = dict(zip(venue_ids[within].tolist(), distances[within].tolist()))
+    if not venue_distances:
+        return []
+
+    events = Event.objects.filter(
+        status='approved',
+        venue_id__in=venue_distances.keys(),
+        date__lt=end_time,
+    ).filter(
+        models.Q(end_date__gte=start_time) | models.Q(end_date__isnull=True, date__gte=start_time)
+    ).select_related('venue')
+    nearby = sorted(((event, venue_distances[event.venue_id]) for event in events), key=lambda pair: (pair[1], pair[0].date))
+    return nearby[:limit]
+
+def _free_slots_version_key(day):
+    return f'free_slots_version:{day.isoformat()}'
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+def invalidate_free_slots(start_time, end_time):
+    """Drop cached free slots for every local day touched by [start_time, end_time]."""
+    day = timezone.localtime(start_time).date()
+    last_day = timezone.localtime(end_time).date()
+    while day <= last_day:
+        bump_cache_version(_free_slots_version_key(day))
+        day += timedelta(days=1)
+
+@receiver(post_save, sender=VenueBooking)
+@receiver(post_delete, sender=VenueBooking)
+def invalidate_free_slots_on_booking_change(sender, instance, **kwargs):
+    # Bumped once the booking is committed: a request served before that would cache the old
+    # rows under the new version. A moved booking frees its old days too; _loaded_slot still
+    # holds them during post_save.
+    previous = getattr(instance, '_loaded_slot', None)
+    if previous and previous[1:] != (instance.start_time, instance.end_time):
+        transaction.on_commit(partial(invalidate_free_slots, previous[1], previous[2]))
+    transaction.on_commit(partial(invalidate_free_slots, instance.start_time, instance.end_time))
+
+@receiver(post_save, sender=Venue)
+@receiver(post_delete, sender=Venue)
+def invalidate_free_slots_on_venue_change(sender, instance, **kwargs):
+    # Names and capacities are cached with the slots, so any venue change stales every day
+    transaction.on_commit(partial(bump_cache_version, FREE_SLOTS_VENUES_VERSION_KEY))
+
+def _bookings_created(slots):
+    if not slots:
+        return
+    invalidate_free_slots(min(start for _, start, _ in slots), max(end for _, _, end in slots))
+    for venue_id, start_time, end_time in slots:
+        update_venue_utilization(venue_id, start_time, end_time)
+
+def booking_utilization(start_time, end_time):
+    """Split a booking over local clock hours: {week_start: 7 x 24 array of booked hours}."""
+    weeks = {}
+    cursor = timezone.localtime(start_time)
+    end = timezone.localtime(end_time)
+    while cursor < end:
+        step_end = min(cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1), end)
+        week_start = cursor.date() - timedelta(days=cursor.weekday())
+        heatmap = weeks.setdefault(week_start, np.zeros((7, 24)))
+        heatmap[cursor.weekday(), cursor.hour] += (step_end - cursor).total_seconds() / 3600
+        cursor = step_end
+    return weeks
+
+def update_venue_utilization(venue_id, start_time, end_time, sign=1):
+    """Add (sign=1) or take back (sign=-1) one booking's hours in the weekly utilization rows."""
+    with transaction.atomic():
+        for week_start, heatmap in booking_utilization(start_time, end_time).items():
+            rows = VenueUtilization.objects.select_for_update()
+            if sign > 0:
+                row, _ = rows.get_or_create(venue_id=venue_id, week_start=week_start)
+            else:
+                # Nothing to take back from; also avoids recreating rows while the venue is deleted
+                row = rows.filter(venue_id=venue_id, week_start=week_start).first()
+                if row is None:
+                    continue
+            current = np.array(row.hourly_heatmap) if row.hourly_heatmap else np.zeros((7, 24))
+            current = np.maximum(current + sign * heatmap, 0)
+            row.hourly_heatmap = current.round(4).tolist()
+            row.booked_hours = round(float(current.sum()), 4)
+            row.save(update_fields=['hourly_heatmap', 'booked_hours'])
+
+@receiver(post_save, sender=VenueBooking)
+def update_utilization_on_booking_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_slot', None)
+    if not created and previous:
+        update_venue_utilization(*previous, sign=-1)
+    update_venue_utilization(instance.venue_id, instance.start_time, instance.end_time)
+
+@receiver(post_delete, sender=VenueBooking)
+def update_utilization_on_booking_delete(sender, instance, **kwargs):
+    update_venue_utilization(instance.venue_id, instance.start_time, instance.end_time, sign=-1)
+
+def _free_intervals(busy, window_start, window_end):
+    # Sweep-line over bookings sorted by start: advance a cursor past each busy
+    # stretch and emit the gap in front of it
+    cursor = window_start
+    free = []
+    for start, end in busy:
+        if end <= cursor:
+            continue
+        if start > cursor:
+            free.append((cursor, min(start, window_end)))
+        cursor = max(cursor, end)
+        if cursor >= window_end:
+            break
+    if cursor < window_end:
+        free.append((cursor, window_end))
+    return free
+
+def _compute_free_slots(days, min_capacity):
+    """Free intervals per day for venues with at least `min_capacity` seats, from one bookings query."""
+    venues = list(Venue.objects.filter(capacity__gte=min_capacity).order_by('capacity', 'id').values('id', 'name', 'capacity'))
+    range_start, _ = _day_bounds(min(days))
+    _, range_end = _day_bounds(max(days))
+    busy = defaultdict(list)
+    bookings = VenueBooking.objects.filter(
+        venue__capacity__gte=min_capacity,
+        start_time__lt=range_end,
+        end_time__gt=range_start,
+    ).order_by('start_time').values_list('venue_id', 'start_time', 'end_time')
+    for venue_id, start, end in bookings:
+        busy[venue_id].append((start, end))
+
+    slots = {}
+    for day in days:
+        day_start, day_end = _day_bounds(day)
+        slots[day] = [
+            dict(venue, free=_free_intervals(busy[venue['id']], day_start, day_end))
+            for venue in venues
+        ]
+    return slots
+
+def find_free_slots(start_date, end_date, min_capacity, duration):
+    """
+    Free time slots of at least `duration` (a timedelta) between `start_date` and
+    `end_date` (inclusive local dates) for every venue seating `min_capacity`.
+    Per-day results are cached per capacity bucket until a booking on that day, or any venue, changes.
+    """
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    bucket = min_capacity // FREE_SLOTS_CAPACITY_BUCKET * FREE_SLOTS_CAPACITY_BUCKET
+
+    versions = cache.get_many([FREE_SLOTS_VENUES_VERSION_KEY] + [_free_slots_version_key(day) for day in days])
+    venues_version = versions.get(FREE_SLOTS_VENUES_VERSION_KEY, 0)
+    keys = {
+        day: f'free_slots:{day.isoformat()}:{bucket}:{venues_version}:{versions.get(_free_slots_version_key(day), 0)}'
+        for day in days
+    }
+    cached = cache.get_many(keys.values())
+    per_day = {day: cached[key] for day, key in keys.items() if key in cached}
+
+    missing = [day for day in days if day not in per_day]
+    if missing:
+        computed = _compute_free_slots(missing, bucket)
+        cache.set_many({keys[day]: computed[day] for day in missing}, timeout=FREE_SLOTS_CACHE_TIMEOUT)
+        per_day.update(computed)
+
+    # Stitch the days together, joining gaps that run across midnight
+    venues = {}
+    for day in days:
+        for venue in per_day[day]:
+            if venue['capacity'] < min_capacity:
+                continue
+            entry = venues.setdefault(venue['id'], {key: venue[key] for key in ('id', 'name', 'capacity')} | {'slots': []})
+            for start, end in venue['free']:
+                if entry['slots'] and entry['slots'][-1][1] == start:
+                    entry['slots'][-1] = (entry['slots'][-1][0], end)
+                else:
+                    entry['slots'].append((start, end))
+
+    results = []
+    for entry in venues.values():
+        entry['slots'] = [(start, end) for start, end in entry['slots'] if end - start >= duration]
+        if entry['slots']:
+            results.append(entry)
+    return results
+
+def _volunteer_version_key(event_id):
+    return f'volunteer_version:{event_id}'
+
+@receiver(post_save, sender=Volunteer)
+@receiver(post_delete, sender=Volunteer)
+def invalidate_volunteer_vectors(sender, instance, **kwargs):
+    bump_cache_version(_volunteer_version_key(instance.event_id))
+    bump_task_version(instance.event_id)
+
+def _cached_for_volunteers(cache_key, volunteer_ids):
+    """
+    The entry cached under cache_key if it was built for exactly these volunteer ids, else None.
+    The admin's approve action uses queryset.update(), which bumps no version, so the set of
+    volunteers is compared too.
+    """
+    cached = cache.get(cache_key)
+    if cached is not None and cached['volunteer_ids'] == volunteer_ids:
+        return cached
+    return None
+
+def get_volunteer_vectors(event, volunteers):
+    """
+    TF-IDF vectorizer fitted on the volunteers' hobbies_interests and their
+    volunteer x term matrix, cached per event until one of its Volunteer rows changes.
+    Returns None when the volunteers wrote nothing usable.
+    """
+    # Cached in id order, whatever order the caller's queryset came back in
+    order = np.argsort([vol.id for vol in volunteers], kind='stable').tolist()
+    volunteer_ids = [volunteers[i].id for i in order]
+    version = cache.get(_volunteer_version_key(event.id), 0)
+    cache_key = f'volunteer_vectors:{event.id}:{version}'
+    cached = _cached_for_volunteers(cache_key, volunteer_ids)
+    if cached is not None:
+        vectors = cached['vectors']
+    else:
+        vectorizer = TfidfVectorizer(stop_words='english', sublinear_tf=True)
+        try:
+            vectors = (vectorizer, vectorizer.fit_transform([volunteers[i].hobbies_interests or '' for i in order]))
+        except ValueError:  # Empty vocabulary
+            vectors = None
+        cache.set(cache_key, {'volunteer_ids': volunteer_ids, 'vectors': vectors}, timeout=VOLUNTEER_VECTORS_TIMEOUT)
+    if vectors is None:
+        return None
+    # Rows back in the caller's order
+    vectorizer, volunteer_matrix = vectors
+    return vectorizer, volunteer_matrix[np.argsort(order)]
+
+def task_affinity(event, volunteers, descriptions):
+    """Cosine similarity of each volunteer's interests to each task description (volunteers x tasks)."""
+    vectors = get_volunteer_vectors(event, volunteers)
+    if vectors is None:
+        return np.zeros((len(volunteers), len(descriptions)))
+    vectorizer, volunteer_matrix = vectors
+    # TF-IDF rows are L2-normalised, so one sparse product gives the cosine similarities
+    return (volunteer_matrix @ vectorizer.transform(descriptions).T).toarray()
+
+def volunteer_communication_costs(mst):
+    """Mean weight of each volunteer's links in the communication MST (0 for an isolated volunteer)."""
+    links = (mst + mst.T).tocsr()
+    degree = np.diff(links.indptr)
+    totals = np.asarray(links.sum(axis=1)).ravel()
+    return np.divide(totals, degree, out=np.zeros(len(degree)), where=degree > 0)
+
+def solve_task_assignment(n_tasks, workload, communication_cost, match_scores=None):
+    """
+    Assign `n_tasks` tasks to volunteers in one linear_sum_assignment call.
+    Each volunteer is replicated into slots; slot k costs their (workload + k)-th
+    open task, so load spreads evenly. Lower communication cost and higher
+    match score (volunteers x tasks) pull tasks towards a volunteer.
+    Returns the volunteer index for each task.
+    """
+    n_volunteers = len(workload)
+    slots = -(-n_tasks // n_volunteers)  # ceil, so there is a slot for every task
+    slot_cost = (
+        TASK_WORKLOAD_WEIGHT * (workload[:, None] + np.arange(slots)[None, :])
+        + TASK_COMMUNICATION_WEIGHT * communication_cost[:, None]
+    )
+    costs = np.repeat(slot_cost.reshape(-1, 1), n_tasks, axis=1)
+    if match_scores is not None:
+        costs -= TASK_MATCH_WEIGHT * np.repeat(match_scores, slots, axis=0)
+    rows, cols = linear_sum_assignment(costs)
+    assigned = np.empty(n_tasks, dtype=int)
+    assigned[cols] = rows // slots
+    return assigned
 
 def suggest_task_assignments(volunteers, tasks, event):
     if not volunteers or not tasks:
         return {}
 
     volunteer_list = list(volunteers)
-    n = len(volunteer_list)
-    edges = []
-
-    # Compute communication cost based on participation frequency
-    for i in range(n):
-        for j in range(i + 1, n):
-            vol1, vol2 = volunteer_list[i], volunteer_list[j]
-            vol1_participation = EventParticipation.objects.filter(user=vol1.user).count()
-            vol2_participation = EventParticipation.objects.filter(user=vol2.user).count()
-            cost = 1 if vol1_participation > 5 and vol2_participation > 5 else (2 if vol1_participation > 5 or vol2_participation > 5 else 3)
-            edges.append((cost, i, j))
-
-    # Kruskal's MST
-    edges.sort()
-    uf = UnionFind(n)
-    mst = []
-    for cost, u, v in edges:
-        if uf.find(u) != uf.find(v):
-            uf.union(u, v)
-            mst.append((u, v))
+
+    # Participation counts for all volunteers in one grouped query
+    participation = dict(
+        EventParticipation.objects.filter(user__in=[vol.user_id for vol in volunteer_list])
+        .values('user').annotate(count=Count('id')).values_list('user', 'count')
+    )
+    experienced = np.array([participation.get(vol.user_id, 0) > 5 for vol in volunteer_list], dtype=int)
+
+    # Communication cost based on participation frequency:
+    # 1 if both are experienced, 2 if one is, 3 if neither
+    costs = 3 - (experienced[:, None] + experienced[None, :])
+    mst = minimum_spanning_tree(np.triu(costs, k=1))
 
     # Compute workload and suggest assignments for unassigned tasks only
-    workload = {vol.id: Task.objects.filter(volunteer=vol, event=vol.event, status=False).count() for vol in volunteer_list}
-    suggestions = {}
-    # Filter unassigned tasks
-    unassigned_tasks = [task for task in Task.objects.filter(event=event) if not task.volunteer]
-    unassigned_descriptions = [task.description for task in unassigned_tasks]
-
-    for task_desc in unassigned_descriptions:
-        min_workload = float('inf')
-        suggested_volunteer = None
-        for i, vol in enumerate(volunteer_list):
-            current_workload = workload.get(vol.id, 0)
-            if current_workload < min_workload:
-                min_workload = current_workload
-                suggested_volunteer = vol
-        if suggested_volunteer:
-            suggestions[task_desc] = suggested_volunteer
-            workload[suggested_volunteer.id] = workload.get(suggested_volunteer.id, 0) + 1
-
-    return suggestions
\ No newline at end of file
+    open_tasks = dict(
+        Task.objects.filter(volunteer__in=volunteer_list, status=False)
+        .values('volunteer').annotate(count=Count('id')).values_list('volunteer', 'count')
+    )
+    workload = np.array([open_tasks.get(vol.id, 0) for vol in volunteer_list])
+    unassigned_descriptions = [task.description for task in tasks if not task.volunteer_id]
+    if not unassigned_descriptions:
+        return {}
+
+    assigned = solve_task_assignment(
+        len(unassigned_descriptions),
+        workload,
+        volunteer_communication_costs(mst),
+        task_affinity(event, volunteer_list, unassigned_descriptions),
+    )
+    return {
+        task_desc: volunteer_list[i]
+        for task_desc, i in zip(unassigned_descriptions, assigned)
+    }
+
+def _task_version_key(event_id):
+    return f'task_version:{event_id}'
+
+def bump_task_version(event_id):
+    bump_cache_version(_task_version_key(event_id))
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_suggestions(sender, instance, **kwargs):
+    bump_task_version(instance.event_id)
+
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_delete, sender=EventParticipation)
+def invalidate_task_suggestions_on_participation(sender, instance, **kwargs):
+    # Participation counts feed the communication costs of every event the user volunteers for
+    for event_id in Volunteer.objects.filter(user_id=instance.user_id).values_list('event_id', flat=True):
+        bump_task_version(event_id)
+
+def get_task_suggestions(volunteers, tasks, event):
+    """
+    suggest_task_assignments, cached per event under its task version, which is
+    bumped whenever a Task, Volunteer or volunteer's EventParticipation changes.
+    """
+    # Id order, so the cache check and the assignment's tie-breaks ignore queryset order
+    volunteers_by_id = {vol.id: vol for vol in sorted(volunteers, key=lambda vol: vol.id)}
+    version = cache.get(_task_version_key(event.id), 0)
+    cache_key = f'task_suggestions:{event.id}:{version}'
+    cached = _cached_for_volunteers(cache_key, list(volunteers_by_id))
+    if cached is not None:
+        return {task_desc: volunteers_by_id[vol_id] for task_desc, vol_id in cached['suggestions'].items()}
+
+    suggestions = suggest_task_assignments(list(volunteers_by_id.values()), tasks, event)
+    cache.set(cache_key, {
+        'volunteer_ids': list(volunteers_by_id),
+        'suggestions': {task_desc: vol.id for task_desc, vol in suggestions.items()},
+    }, timeout=TASK_SUGGESTIONS_TIMEOUT)
+    return suggestions
+
+def serialize_task(task):
+    return {
+        'id': task.id,
+        'description': task.description,
+        'status': task.status,
+        'volunteer_id': task.volunteer_id,
+        'volunteer': task.volunteer.user.username if task.volunteer_id else None,
+        # Lets a volunteer's board tell which rows are theirs to mark done
+        'volunteer_user_id': task.volunteer.user_id if task.volunteer_id else None,
+    }
+
+def is_event_participant(user, event):
+    """The host and approved volunteers may use an event's todo board."""
+    if not user.is_authenticated:
+        return False
+    return event.proposed_by_id == user.id or Volunteer.objects.filter(event=event, user=user, is_approved=True).exists()
+
+def task_board_group_name(event_id):
+    return f'task_board_{event_id}'
+
+def broadcast_task_delta(event_id, action, task_data):
+    """Send one task row change to everyone connected to the event's todo board."""
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            task_board_group_name(event_id),
+            {'type': 'task_delta', 'action': action, 'task': task_data},
+        )
+    except Exception:
+        # A live board is a nicety; never fail the write because the channel layer is down
+        logger.exception("Could not broadcast task %s for event %s", action, event_id)
+
+@receiver(post_save, sender=Task)
+def broadcast_task_save(sender, instance, created, **kwargs):
+    task_data = serialize_task(instance)
+    transaction.on_commit(partial(broadcast_task_delta, instance.event_id, 'created' if created else 'updated', task_data))
+
+@receiver(post_delete, sender=Task)
+def broadcast_task_delete(sender, instance, **kwargs):
+    transaction.on_commit(partial(broadcast_task_delta, instance.event_id, 'deleted', {'id': instance.id}))
@@ -6,12 +6,17 @@ from django.contrib import messages
 from django.db.models import Avg
 from django.core.exceptions import ValidationError
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.views.decorators.http import require_POST
+from django.db import transaction
+from functools import partial
 
 from .models import (Event, EventView, EventParticipation, Volunteer,
                      Venue, Rating, GroupChat,GroupChatMember, Message, Task, ApprovalHistory)
 
 from .forms import EventProposalForm, VolunteerForm
-from .utils import allocate_venue, suggest_task_assignments
+from .utils import (get_task_suggestions, bump_task_version, serialize_task,
+                    broadcast_task_delta, is_event_participant, find_free_slots, find_nearby_events)
+from .recommendations import recommendation_store, item_recommendations
 from django.core.mail import send_mail
 from django.conf import settings
 from datetime import datetime
@@ -22,7 +27,7 @@ import os
 import pandas as pd
 import logging
 
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from decision_tree.models import EventPredictionCount
 
 # Helper function for notification
@@ -105,48 +110,19 @@ def home(request):
     recommended_events = None
 
     if request.user.is_authenticated:
-        # Try collaborative recommendations
-        try:
-            with open('collaborative_recommendations.json', 'r') as f:
-                collaborative_recs = json.load(f)
-            recommended_ids = collaborative_recs.get(str(request.user.id), [])
+        # The store serves ALS ahead of collaborative and content lists, unless one of those
+        # was refreshed for this user since; then item-item neighbours of recent activity, then
+        # highlighted events. The lists are ranked best first, so their order is kept. A list
+        # whose events have all started or been un-approved since falls through to the next.
+        for recommend in (recommendation_store.get, item_recommendations):
+            recommended_ids = recommend(request.user.id)
             if recommended_ids:
-                recommended_events = Event.objects.filter(
-                    id__in=recommended_ids,
-                    status='approved',
-                    date__gte=timezone.now()
-                ).order_by('date')[:3]
-        except (FileNotFoundError, json.JSONDecodeError):
-            recommended_events = None
-
-        # Fallback to content-based recommendations
-        if not recommended_events or not recommended_events.exists():
-            try:
-                with open('recommendations.json', 'r') as f:
-                    recommendations = json.load(f)
-                recommended_ids = recommendations.get(str(request.user.id), [])
-                if recommended_ids:
-                    recommended_events = Event.objects.filter(
-                        id__in=recommended_ids,
-                        status='approved',
-                        date__gte=timezone.now()
-                    ).order_by('date')[:3]
-            except (FileNotFoundError, json.JSONDecodeError):
-                recommended_events = None
-
-        # Fallback to event_type matching
-        if not recommended_events or not recommended_events.exists():
-            viewed_events = Event.objects.filter(views__user=request.user)
-            if viewed_events.exists():
-                event_types = set(viewed_events.values_list('event_type', flat=True))
-                recommended_events = Event.objects.filter(
-                    event_type__in=event_types,
-                    status='approved',
-                    date__gte=timezone.now()
-                ).exclude(proposed_by=request.user).order_by('date')[:3]
-
-        # Final fallback to highlighted events
-        if not recommended_events or not recommended_events.exists():
+                servable = Event.objects.filter(status='approved', date__gte=timezone.now()).in_bulk(recommended_ids)
+                recommended_events = [servable[event_id] for event_id in recommended_ids if event_id in servable][:3]
+                if recommended_events:
+                    break
+
+        if not recommended_events:
             recommended_events = Event.objects.filter(
                 status='approved',
                 date__gte=timezone.now(),
@@ -166,10 +142,11 @@ def home(request):
             if request.user.is_superuser:
                 event.status = 'approved'
             event.save()
-            if event.status == 'approved' and allocate_venue(event):
-                messages.success(request, f"Venue allocated for {event.title}.")
+            if event.status == 'approved':
+                # The post_save receiver has already queued the allocation
+                messages.success(request, f"Event {event.title} approved, venue allocation queued.")
             else:
-                messages.info(request, f"Event {event.title} submitted for approval.") if not request.user.is_superuser else messages.warning(f"No suitable venue available for {event.title}.")
+                messages.info(request, f"Event {event.title} submitted for approval.")
             return redirect('home')
     else:
         form = EventProposalForm()
@@ -559,12 +536,12 @@ def todo_view(request, event_id):
         messages.error(request, "This event is not approved for tasks.")
         return redirect('home')
 
-    is_participant = Volunteer.objects.filter(event=event, user=request.user, is_approved=True).exists() or event.proposed_by == request.user
+    is_participant = is_event_participant(request.user, event)
     if not is_participant:
         messages.error(request, "You are not a participant in this event.")
         return redirect('home')
 
-    volunteers = Volunteer.objects.filter(event=event, is_approved=True)
+    volunteers = Volunteer.objects.filter(event=event, is_approved=True).order_by('id')
     tasks = Task.objects.filter(event=event)
 
     is_host = (event.proposed_by == request.user)
@@ -619,7 +596,7 @@ def todo_view(request, event_id):
     # Task Assignment Suggestions (Host Only)
     task_suggestions = {}
     if is_host:
-        task_suggestions = suggest_task_assignments(volunteers, tasks, event)
+        task_suggestions = get_task_suggestions(volunteers, tasks, event)
 
     context = {
         'event': event,
@@ -631,4 +608,155 @@ def todo_view(request, event_id):
     }
     return render(request, 'events/todo.html', context)
 
+TASK_BULK_OPERATIONS = ('create', 'assign', 'edit', 'delete')
 
+@require_POST
+def bulk_tasks(request, event_id):
+    event = get_object_or_404(Event, id=event_id)
+    if not request.user.is_authenticated or event.proposed_by != request.user or event.status != 'approved':
+        return JsonResponse({"error": "Only the host of an approved event can manage its tasks."}, status=403)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        operations = data.get('operations', [])
+        accept_suggestions = bool(data.get('accept_suggestions', False))
+        if not isinstance(operations, list):
+            raise ValueError
+    except (json.JSONDecodeError, UnicodeDecodeError, AttributeError, ValueError):
+        return JsonResponse({"error": "Send {'operations': [...], 'accept_suggestions': bool} as JSON."}, status=400)
+
+    tasks = {task.id: task for task in Task.objects.filter(event=event).select_related('volunteer__user')}
+    volunteers = {vol.id: vol for vol in Volunteer.objects.filter(event=event).select_related('user')}
+    to_create, changed, to_delete = [], {}, set()
+
+    # Validate everything before writing anything
+    for index, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        if op not in TASK_BULK_OPERATIONS:
+            return JsonResponse({"error": f"Operation {index}: op must be one of {', '.join(TASK_BULK_OPERATIONS)}."}, status=400)
+        if op == 'create':
+            description = str(operation.get('description', '')).strip()
+            if not description:
+                return JsonResponse({"error": f"Operation {index}: description is required."}, status=400)
+            to_create.append(Task(event=event, description=description))
+            continue
+
+        task = tasks.get(operation.get('task_id'))
+        if task is None or task.id in to_delete:
+            return JsonResponse({"error": f"Operation {index}: unknown task {operation.get('task_id')}."}, status=400)
+        if op == 'delete':
+            to_delete.add(task.id)
+            changed.pop(task.id, None)
+        elif op == 'assign':
+            volunteer = volunteers.get(operation.get('volunteer_id'))
+            if volunteer is None:
+                return JsonResponse({"error": f"Operation {index}: unknown volunteer {operation.get('volunteer_id')}."}, status=400)
+            task.volunteer = volunteer
+            changed[task.id] = task
+        elif op == 'edit':
+            description = str(operation.get('description', '')).strip()
+            if not description:
+                return JsonResponse({"error": f"Operation {index}: description is required."}, status=400)
+            task.description = description
+            changed[task.id] = task
+
+    with transaction.atomic():
+        if to_delete:
+            Task.objects.filter(event=event, id__in=to_delete).delete()
+        if changed:
+            Task.objects.bulk_update(changed.values(), ['description', 'volunteer'])
+        created = Task.objects.bulk_create(to_create)
+        # bulk_create/bulk_update send no signals, so invalidate cached suggestions here
+        bump_task_version(event.id)
+
+        remaining = [task for task_id, task in tasks.items() if task_id not in to_delete] + created
+        created_ids = {task.id for task in created}
+        changed.update((task.id, task) for task in created)
+        if accept_suggestions:
+            approved = Volunteer.objects.filter(event=event, is_approved=True).select_related('user').order_by('id')
+            suggestions = get_task_suggestions(approved, remaining, event)
+            accepted = []
+            for task in remaining:
+                if not task.volunteer_id and task.description in suggestions:
+                    task.volunteer = suggestions[task.description]
+                    accepted.append(task)
+            if accepted:
+                Task.objects.bulk_update(accepted, ['volunteer'])
+                bump_task_version(event.id)
+                changed.update((task.id, task) for task in accepted)
+
+        # Deletes went through post_delete; push the bulk-written rows to live boards here
+        for task in changed.values():
+            action = 'created' if task.id in created_ids else 'updated'
+            transaction.on_commit(partial(broadcast_task_delta, event.id, action, serialize_task(task)))
+
+    return JsonResponse({'tasks': [serialize_task(task) for task in sorted(remaining, key=lambda task: task.id)]})
+
+MAX_FREE_SLOT_DAYS = 31
+
+@login_required
+def venue_free_slots(request):
+    try:
+        start_date = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.GET.get('end', request.GET['start']), '%Y-%m-%d').date()
+        min_capacity = int(request.GET.get('capacity', 0))
+        duration_hours = float(request.GET.get('duration', 1))
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Use start=YYYY-MM-DD, optional end=YYYY-MM-DD, capacity and duration (hours)."}, status=400)
+
+    if end_date < start_date or (end_date - start_date).days >= MAX_FREE_SLOT_DAYS:
+        return JsonResponse({"error": f"Date range must be between 1 and {MAX_FREE_SLOT_DAYS} days."}, status=400)
+    # Bounded before building the timedelta, which overflows on inf or huge values; NaN fails the check too
+    if min_capacity < 0 or not 0 < duration_hours <= MAX_FREE_SLOT_DAYS * 24:
+        return JsonResponse({"error": f"Capacity must be positive and duration between 0 and {MAX_FREE_SLOT_DAYS * 24} hours."}, status=400)
+    duration = timedelta(hours=duration_hours)
+
+    venues = find_free_slots(start_date, end_date, min_capacity, duration)
+    return JsonResponse({
+        'venues': [
+            {
+                'id': venue['id'],
+                'name': venue['name'],
+                'capacity': venue['capacity'],
+                'slots': [
+                    {'start': timezone.localtime(start).isoformat(), 'end': timezone.localtime(end).isoformat()}
+                    for start, end in venue['slots']
+                ],
+            }
+            for venue in venues
+        ]
+    })
+
+MAX_NEARBY_RADIUS_KM = 100
+
+def nearby_events(request):
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lon'])
+        radius_km = float(request.GET.get('radius', 5))
+        start_time = datetime.fromisoformat(request.GET['start']) if 'start' in request.GET else timezone.now()
+        end_time = datetime.fromisoformat(request.GET['end']) if 'end' in request.GET else start_time + timedelta(days=30)
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Use lat, lon, optional radius (km) and ISO start/end."}, status=400)
+
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or not 0 < radius_km <= MAX_NEARBY_RADIUS_KM:
+        return JsonResponse({"error": f"Invalid coordinates or radius (max {MAX_NEARBY_RADIUS_KM} km)."}, status=400)
+    if timezone.is_naive(start_time):
+        start_time = timezone.make_aware(start_time)
+    if timezone.is_naive(end_time):
+        end_time = timezone.make_aware(end_time)
+
+    nearby = find_nearby_events(latitude, longitude, radius_km, start_time, end_time)
+    return JsonResponse({
+        'events': [
+            {
+                'id': event.id,
+                'title': event.title,
+                'date': timezone.localtime(event.date).isoformat(),
+                'venue': event.venue.name,
+                'distance_km': round(distance, 2),
+                'url': reverse('event_detail', args=[event.id]),
+            }
+            for event, distance in nearby
+        ]
+    })